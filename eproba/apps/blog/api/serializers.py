@@ -1,6 +1,7 @@
-from apps.users.api.serializers import UserSerializer
 from rest_framework import serializers
 
+from apps.users.api.serializers import UserSerializer
+
 from ..models import Post
 
 
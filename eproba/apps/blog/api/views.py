@@ -1,6 +1,8 @@
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny
 
+from apps.core.api.pagination import KeysetPagination
+
 from ..models import Post
 from .serializers import PostSerializer
 
@@ -13,6 +15,8 @@ class PostViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
     lookup_field = "slug"
+    pagination_class = KeysetPagination
+    pagination_ordering = ("-created_on", "-id")
 
     def get_queryset(self):
         queryset = Post.objects.filter(status=1)
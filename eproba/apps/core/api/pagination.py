@@ -0,0 +1,173 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination.
+
+    Lists stay unpaginated unless the client sends `paginate=true` (or a
+    `cursor`), so older mobile clients keep receiving plain lists. Pages are
+    ordered on the view's `pagination_ordering`, which must end with a unique
+    field, and the cursor stores the position of the last row instead of an
+    offset, so every page costs the same no matter how deep it is.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = settings.API_PAGE_SIZE
+    max_page_size = 200
+    opt_in_query_param = "paginate"
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def is_requested(self, request):
+        return (
+            request.query_params.get(self.opt_in_query_param, "").lower() == "true"
+            or self.cursor_query_param in request.query_params
+        )
+
+    def get_ordering(self, view):
+        return getattr(view, "pagination_ordering", self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            position = self.parse_position(queryset.model, position)
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def parse_position(self, model, position):
+        """
+        Convert the values of a decoded cursor with their model fields.
+
+        The cursor comes from the client, so a value of the wrong type must not
+        reach the query.
+        """
+        try:
+            parsed = [
+                model._meta.get_field(ordering_field.lstrip("-")).to_python(value)
+                for ordering_field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in parsed:
+            raise NotFound(self.invalid_cursor_message)
+        return parsed
+
+    def get_keyset_filter(self, position):
+        """Rows strictly after `position` in the ordering, as (a < x) OR (a = x AND b < y)..."""
+        keyset_filter = Q()
+        preceding = Q()
+        for ordering_field, value in zip(self.ordering, position):
+            field = ordering_field.lstrip("-")
+            lookup = "lt" if ordering_field.startswith("-") else "gt"
+            keyset_filter |= preceding & Q(**{f"{field}__{lookup}": value})
+            preceding &= Q(**{field: value})
+        return keyset_filter
+
+    def get_position(self, instance):
+        position = []
+        for ordering_field in self.ordering:
+            value = getattr(instance, ordering_field.lstrip("-"))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, UUID):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position):
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.opt_in_query_param, "true")
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.opt_in_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to `true` to receive paginated results.",
+                "schema": {"type": "boolean"},
+            },
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
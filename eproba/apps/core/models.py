@@ -1 +1,42 @@
-# Create your models here.
+class TrackedFieldsMixin:
+    """
+    Remember the values of `tracked_fields` as they were loaded from the database.
+
+    `tracked_changes()` reports which of them were modified since, without a
+    query, so signal handlers can react to changes cheaply. List fields by their
+    attname (e.g. `approver_id`). The snapshot is refreshed after each save, once
+    the post_save handlers have run.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
+    def _snapshot_tracked_fields(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            name: getattr(self, name)
+            for name in self.tracked_fields
+            if name not in deferred
+        }
+
+    def tracked_changes(self):
+        """Map each tracked field changed since loading to its loaded value."""
+        loaded_values = getattr(self, "_loaded_values", {})
+        return {
+            name: value
+            for name, value in loaded_values.items()
+            if getattr(self, name) != value
+        }
@@ -0,0 +1,45 @@
+from django.db import transaction
+
+
+class CollectingCallback:
+    """
+    on_commit callback acting once on everything collected during a transaction.
+
+    Register it with on_commit_collect(); subclasses implement `run()`, reading
+    `self.using` and `self.items`.
+    """
+
+    def __init__(self, using, items):
+        self.using = using
+        self.items = set(items)
+
+    def __call__(self):
+        self.run()
+
+    def run(self):
+        raise NotImplementedError
+
+
+def on_commit_collect(callback_class, items, using=None):
+    """
+    Run `callback_class` with `items` once the current transaction commits.
+
+    Inside a transaction the items are merged into a callback of the same class
+    registered earlier, so it runs once with all of them. Outside a transaction
+    it runs right away.
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block:
+        # Merge into a callback of the same savepoint, so a rollback of that
+        # savepoint discards the items together with the callback
+        savepoint_ids = set(connection.savepoint_ids)
+        for callback_savepoint_ids, callback, _ in connection.run_on_commit:
+            if (
+                type(callback) is callback_class
+                and callback_savepoint_ids == savepoint_ids
+            ):
+                callback.items.update(items)
+                return
+    transaction.on_commit(
+        callback_class(connection.alias, items), using=connection.alias
+    )
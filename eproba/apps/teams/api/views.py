@@ -2,7 +2,18 @@ import threading
 from datetime import timedelta
 
 from django.core.mail import EmailMessage, send_mail
-from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models import (
+    Avg,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
 from django.utils import timezone
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
@@ -11,6 +22,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.api.pagination import KeysetPagination
 from apps.core.api.permissions import TokenHasRequiredScope
 from apps.teams.api.permissions import (
     IsAllowedToAccessTeamRequest,
@@ -81,6 +93,8 @@ class TeamViewSet(
         TokenHasRequiredScope,
     ]
     required_scopes = ["teams"]
+    pagination_class = KeysetPagination
+    pagination_ordering = ("name", "id")
 
     def get_queryset(self):
         district = self.request.GET.get("district")
@@ -142,6 +156,8 @@ class TeamRequestViewSet(
         TokenHasRequiredScope,
     ]
     required_scopes = ["teams"]
+    pagination_class = KeysetPagination
+    pagination_ordering = ("-created_at", "-id")
 
     def perform_create(self, serializer):
         """
@@ -356,13 +372,9 @@ class TeamStatisticsAPIView(APIView):
 
         archived_worksheets = worksheets.filter(is_archived=True).count()
 
-        active_fully_completed = 0
-        for worksheet in worksheets.filter(is_archived=False):
-            total_tasks = worksheet.tasks.count()
-            if total_tasks > 0:
-                completed_tasks = worksheet.tasks.filter(status=2).count()
-                if total_tasks == completed_tasks:
-                    active_fully_completed += 1
+        active_fully_completed = worksheets.filter(
+            is_archived=False, task_count__gt=0, completed_task_count=F("task_count")
+        ).count()
 
         worksheet_stats = {
             "total_worksheets": worksheets.count(),
@@ -371,9 +383,10 @@ class TeamStatisticsAPIView(APIView):
             "average_completion_rate": self._calculate_average_completion_rate(
                 worksheets
             ),
-            "pending_approvals": Task.objects.filter(
-                worksheet__user__patrol__team=team, status=1, worksheet__deleted=False
-            ).count(),
+            "pending_approvals": worksheets.aggregate(
+                pending=Sum("pending_task_count")
+            )["pending"]
+            or 0,
         }
 
         # ACTIVITY TRENDS
@@ -384,17 +397,11 @@ class TeamStatisticsAPIView(APIView):
             "worksheets_created_last_30_days": worksheets.filter(
                 created_at__gte=thirty_days_ago
             ).count(),
-            "tasks_completed_last_7_days": Task.objects.filter(
-                worksheet__user__patrol__team=team,
-                worksheet__deleted=False,
-                status=2,
-                approval_date__gte=seven_days_ago,
+            "tasks_completed_last_7_days": self._get_completed_tasks(
+                team, seven_days_ago
             ).count(),
-            "tasks_completed_last_30_days": Task.objects.filter(
-                worksheet__user__patrol__team=team,
-                worksheet__deleted=False,
-                status=2,
-                approval_date__gte=thirty_days_ago,
+            "tasks_completed_last_30_days": self._get_completed_tasks(
+                team, thirty_days_ago
             ).count(),
         }
 
@@ -529,23 +536,26 @@ class TeamStatisticsAPIView(APIView):
 
         return function_data
 
+    def _get_completed_tasks(self, team, time_from):
+        """Tasks of the team approved since `time_from`"""
+        return Task.objects.filter(
+            worksheet__user__patrol__team=team,
+            worksheet__deleted=False,
+            status=2,
+            approval_date__gte=time_from,
+        )
+
     def _calculate_average_completion_rate(self, worksheets):
         """Calculate average completion rate across all worksheets"""
-        active_worksheets = worksheets.filter(is_archived=False)
-        if not active_worksheets.exists():
-            return 0
-
-        total_rate = 0
-        count = 0
-
-        for worksheet in active_worksheets:
-            total_tasks = worksheet.tasks.count()
-            if total_tasks > 0:
-                completed_tasks = worksheet.tasks.filter(status=2).count()
-                total_rate += (completed_tasks / total_tasks) * 100
-                count += 1
-
-        return round(total_rate / count, 1) if count > 0 else 0
+        rate = worksheets.filter(is_archived=False, task_count__gt=0).aggregate(
+            rate=Avg(
+                ExpressionWrapper(
+                    F("completed_task_count") * 100.0 / F("task_count"),
+                    output_field=FloatField(),
+                )
+            )
+        )["rate"]
+        return round(rate, 1) if rate is not None else 0
 
     def _get_patrol_statistics(self, team, organization):
         """Get statistics for each patrol"""
@@ -557,45 +567,12 @@ class TeamStatisticsAPIView(APIView):
         for patrol in patrols:
             member_count = getattr(patrol, "member_count", 0)
 
-            worksheet_count = Worksheet.objects.filter(
-                user__patrol=patrol, deleted=False
-            ).count()
-
-            completed_worksheets = Worksheet.objects.filter(
-                user__patrol=patrol, deleted=False, is_archived=True
-            ).count()
-
-            active_completed = 0
-            for worksheet in Worksheet.objects.filter(
-                user__patrol=patrol, deleted=False, is_archived=False
-            ):
-                total_tasks = worksheet.tasks.count()
-                if total_tasks > 0:
-                    completed_tasks = worksheet.tasks.filter(status=2).count()
-                    if total_tasks == completed_tasks:
-                        active_completed += 1
-
-            completed_worksheets += active_completed
-
-            average_completion_rate = 0
-            active_worksheets = Worksheet.objects.filter(
-                user__patrol=patrol, deleted=False, is_archived=False
+            worksheets = Worksheet.objects.filter(user__patrol=patrol, deleted=False)
+            worksheet_count = worksheets.count()
+            average_completion_rate = self._calculate_average_completion_rate(
+                worksheets
             )
 
-            if active_worksheets.exists():
-                total_completion_rate = 0
-                count = 0
-                for worksheet in active_worksheets:
-                    total_tasks = worksheet.tasks.count()
-                    if total_tasks > 0:
-                        completed_tasks = worksheet.tasks.filter(status=2).count()
-                        task_completion_rate = (completed_tasks / total_tasks) * 100
-                        total_completion_rate += task_completion_rate
-                        count += 1
-                average_completion_rate = (
-                    round(total_completion_rate / count, 1) if count > 0 else 0
-                )
-
             patrol_data.append(
                 {
                     "id": str(patrol.id),
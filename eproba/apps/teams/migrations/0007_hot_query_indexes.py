@@ -0,0 +1,20 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teams", "0006_team_organization"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="teamrequest",
+            index=models.Index(
+                fields=["status", "created_at"], name="teamrequest_status_created_idx"
+            ),
+        ),
+    ]
@@ -2,6 +2,8 @@ import uuid
 
 from django.db import models
 
+from apps.core.models import TrackedFieldsMixin
+
 
 class OrganizationChoice(models.IntegerChoices):
     """
@@ -55,7 +57,7 @@ class Team(models.Model):
         return f"https://eproba.zhr.pl/signup/?team={self.id}"
 
 
-class Patrol(models.Model):
+class Patrol(TrackedFieldsMixin, models.Model):
     """
     Zastęp
     """
@@ -64,6 +66,8 @@ class Patrol(models.Model):
     name = models.CharField(max_length=100)
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="patrols")
 
+    tracked_fields = ("team_id",)
+
     class Meta:
         verbose_name = "Zastęp"
         verbose_name_plural = "Zastępy"
@@ -115,6 +119,12 @@ class TeamRequest(models.Model):
     class Meta:
         verbose_name = "Zgłoszenie drużyny"
         verbose_name_plural = "Zgłoszenia drużyn"
+        indexes = [
+            # Team request list filtered by status, newest first
+            models.Index(
+                fields=["status", "created_at"], name="teamrequest_status_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.team.name} - {self.get_status_display()}"
@@ -8,6 +8,7 @@ from rest_framework.test import APITestCase
 
 from apps.teams.models import District, Patrol, Team, TeamRequest
 from apps.users.models import User
+from apps.worksheets.models import Task, Worksheet, update_task_counts
 
 
 @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
@@ -175,3 +176,40 @@ class TeamRequestApiTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["id"], str(team_request.id))
         self.assertEqual(response.data["approval_outcome"], "can_auto_approve")
+
+
+class TeamStatisticsApiTests(APITestCase):
+    def setUp(self):
+        district = District.objects.create(name="Okręg testowy")
+        team = Team.objects.create(
+            name="1 Testowa Drużyna", short_name="1 TD", district=district
+        )
+        self.patrol = Patrol.objects.create(name="Pierwszy", team=team)
+        self.leader = User.objects.create(
+            email="leader@example.com", patrol=self.patrol, function=4
+        )
+
+    def create_worksheet(self, *statuses):
+        worksheet = Worksheet.objects.create(user=self.leader, name="Próba")
+        Task.objects.bulk_create(
+            Task(worksheet=worksheet, task="Zadanie", status=task_status)
+            for task_status in statuses
+        )
+        update_task_counts([worksheet.id])
+
+    def test_progress_is_read_from_task_counters(self):
+        self.create_worksheet(2, 2)
+        self.create_worksheet(2, 1, 0, 3)
+        self.create_worksheet()
+        self.client.force_authenticate(self.leader)
+
+        response = self.client.get(reverse("team_statistics_api"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data["worksheet_progress"]
+        self.assertEqual(stats["completed_worksheets"], 1)
+        self.assertEqual(stats["average_completion_rate"], 62.5)
+        self.assertEqual(stats["pending_approvals"], 1)
+        self.assertEqual(
+            response.data["patrol_comparison"][0]["average_completion_rate"], 62.5
+        )
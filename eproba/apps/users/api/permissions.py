@@ -1,8 +1,59 @@
+import uuid
+from dataclasses import dataclass
+
 from rest_framework import permissions
 
+from apps.teams.models import Patrol
 from apps.users.models import User
 
 
+@dataclass(frozen=True)
+class PermissionContext:
+    """
+    What object permission checks need to know about the requesting user.
+
+    Resolved once per request by get_permission_context(), so checks of any
+    number of objects compare ids instead of walking the user's patrol and team.
+    """
+
+    user_id: uuid.UUID | None
+    function: int
+    is_staff: bool
+    team_id: uuid.UUID | None
+    organization: int | None
+
+    def is_team_member(self, user) -> bool:
+        """Whether `user`, loaded with its patrol, belongs to the caller's team."""
+        return (
+            self.team_id is not None
+            and user.patrol_id is not None
+            and user.patrol.team_id == self.team_id
+        )
+
+
+def get_permission_context(request) -> PermissionContext:
+    context = getattr(request, "_permission_context", None)
+    if context is None:
+        user = request.user
+        team = None
+        if getattr(user, "patrol_id", None) is not None:
+            # Loading the team together with the patrol also serves the view
+            if not User.patrol.is_cached(user):
+                user.patrol = Patrol.objects.select_related("team").get(
+                    pk=user.patrol_id
+                )
+            team = user.patrol.team
+        context = PermissionContext(
+            user_id=user.pk,
+            function=getattr(user, "function", 0),
+            is_staff=user.is_staff,
+            team_id=team.id if team else None,
+            organization=team.organization if team else None,
+        )
+        request._permission_context = context
+    return context
+
+
 class IsAllowedToManageUserOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, user):
         if request.method in permissions.SAFE_METHODS:
@@ -19,6 +19,7 @@ from rest_framework.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from apps.core.api.pagination import KeysetPagination
 from apps.core.api.permissions import TokenHasRequiredScope
 from apps.teams.services import auto_approve_team_request_after_email_verification
 from apps.users.models import User
@@ -58,6 +59,8 @@ class UserViewSet(
     ]
     required_scopes = ["profile"]
     lookup_field = "id"
+    pagination_class = KeysetPagination
+    pagination_ordering = ("-created_at", "-id")
 
     def get_serializer_class(self):
         if self.request.user.function >= 3:
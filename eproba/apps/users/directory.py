@@ -0,0 +1,69 @@
+from django.core.cache import caches
+
+from apps.core.utils import CollectingCallback, on_commit_collect
+from apps.teams.models import Patrol
+from apps.users.api.serializers import PublicUserSerializer
+from apps.users.models import User
+
+DIRECTORY_CACHE_ALIAS = "shared"
+# Lowest function allowed to approve tasks, general ones only below 3
+APPROVER_MIN_FUNCTION = 2
+
+
+def _get_directory_key(team_id):
+    return f"approvers:{team_id}"
+
+
+def get_team_approvers(team_id):
+    """
+    Active members of a team who may approve tasks, serialized for the API.
+
+    Loaded with a single query and cached until a member who is or was an
+    approver changes, or the team or one of its patrols does.
+    """
+    directory_cache = caches[DIRECTORY_CACHE_ALIAS]
+    key = _get_directory_key(team_id)
+    approvers = directory_cache.get(key)
+    if approvers is None:
+        approvers = PublicUserSerializer(
+            User.objects.filter(
+                patrol__team_id=team_id,
+                is_active=True,
+                function__gte=APPROVER_MIN_FUNCTION,
+            )
+            .select_related("patrol__team")
+            .order_by("-function", "nickname"),
+            many=True,
+        ).data
+        directory_cache.set(key, approvers)
+    return approvers
+
+
+class _DirectoryInvalidation(CollectingCallback):
+    """
+    on_commit callback dropping the cached directories of the collected teams.
+
+    Items are ("team", id) or ("patrol", id), the latter resolved to their teams
+    with one query.
+    """
+
+    def run(self):
+        team_ids = {value for kind, value in self.items if kind == "team"}
+        patrol_ids = [value for kind, value in self.items if kind == "patrol"]
+        if patrol_ids:
+            team_ids.update(
+                Patrol.objects.using(self.using)
+                .filter(id__in=patrol_ids)
+                .values_list("team_id", flat=True)
+            )
+        caches[DIRECTORY_CACHE_ALIAS].delete_many(
+            [_get_directory_key(team_id) for team_id in team_ids]
+        )
+
+
+def invalidate_approver_directory(team_ids=(), patrol_ids=(), using=None):
+    """Drop the cached approvers of the given teams and patrols' teams on commit."""
+    items = {("team", team_id) for team_id in team_ids if team_id is not None}
+    items.update(("patrol", patrol_id) for patrol_id in patrol_ids if patrol_id)
+    if items:
+        on_commit_collect(_DirectoryInvalidation, items, using=using)
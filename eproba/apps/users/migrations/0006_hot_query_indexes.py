@@ -0,0 +1,22 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("teams", "0007_hot_query_indexes"),
+        ("users", "0005_user_email_notifications_alter_user_email"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["patrol", "function"],
+                name="user_active_patrol_idx",
+            ),
+        ),
+    ]
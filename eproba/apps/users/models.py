@@ -6,6 +6,7 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, UserM
 from django.db import models
 from django.db.models import UUIDField
 
+from apps.core.models import TrackedFieldsMixin
 from apps.teams.models import Patrol
 
 
@@ -45,7 +46,7 @@ scout_rank_female = {
 }
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(TrackedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     GENDER_CHOICES = [(0, "Mężczyzna"), (1, "Kobieta"), (2, "Inna")]
     SCOUT_RANK_CHOICES = [
         (0, "brak stopnia"),
@@ -104,11 +105,21 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = "email"
 
+    tracked_fields = ("function", "patrol_id")
+
     objects = UserManager()
 
     class Meta:
         verbose_name = "Użytkownik"
         verbose_name_plural = "Użytkownicy"
+        indexes = [
+            # Active members of a patrol or team, e.g. approvers by function
+            models.Index(
+                fields=["patrol", "function"],
+                condition=models.Q(is_active=True),
+                name="user_active_patrol_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.full_name_nickname() or self.email
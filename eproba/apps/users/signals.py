@@ -1,8 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from oauth2_provider.models import AccessToken, RefreshToken
 
+from apps.teams.models import Patrol, Team
+
+from .directory import APPROVER_MIN_FUNCTION, invalidate_approver_directory
+
 User = get_user_model()
 
 
@@ -19,3 +23,40 @@ def user_deactivated(sender: User, instance: User, **kwargs):
         except sender.DoesNotExist:
             # User is being created for the first time, no tokens to deactivate
             pass
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def approver_changed(sender, instance, using, **kwargs):
+    old_values = instance.tracked_changes()
+    # Only members who are or were approvers are listed in a directory
+    if (
+        max(instance.function, old_values.get("function", instance.function))
+        < APPROVER_MIN_FUNCTION
+    ):
+        return
+    invalidate_approver_directory(
+        patrol_ids=[
+            instance.patrol_id,
+            old_values.get("patrol_id", instance.patrol_id),
+        ],
+        using=using,
+    )
+
+
+@receiver(post_save, sender=Patrol)
+@receiver(post_delete, sender=Patrol)
+def patrol_changed(sender, instance, using, **kwargs):
+    # Patrol names are part of the directory, a moved patrol leaves both teams
+    invalidate_approver_directory(
+        team_ids=[
+            instance.team_id,
+            instance.tracked_changes().get("team_id", instance.team_id),
+        ],
+        using=using,
+    )
+
+
+@receiver(post_save, sender=Team)
+def team_changed(sender, instance, using, **kwargs):
+    invalidate_approver_directory(team_ids=[instance.id], using=using)
@@ -4,7 +4,7 @@ from functools import wraps
 
 from django.conf import settings
 from django.contrib import messages
-from django.core.mail import send_mail
+from django.core.mail import send_mail, send_mass_mail
 from django.db.models.manager import BaseManager
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
@@ -171,8 +171,6 @@ def send_email_notification(
     if not enabled_users:
         return
 
-    recipient_emails = [user.email for user in enabled_users]
-
     try:
         email_message = message
         if link:
@@ -180,11 +178,10 @@ def send_email_notification(
                 f"\n\nLink: {urllib.parse.urljoin('https://eproba.zhr.pl', link)}"
             )
 
-        send_mail(
-            subject,
-            email_message,
-            None,
-            recipient_emails,
+        # One message per recipient, so they don't see each other's address,
+        # all sent over a single connection
+        send_mass_mail(
+            (subject, email_message, None, [user.email]) for user in enabled_users
         )
     except Exception as e:
         logger.error(f"Failed to send email notification: {e}")
@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from apps.webhooks.tasks import trigger_webhooks
+from apps.webhooks.tasks import trigger_webhooks, trigger_webhooks_batch
 from apps.worksheets.models import Task
+from apps.worksheets.signals import tasks_bulk_created, tasks_bulk_updated
 
 
 def serialize_task(task_obj):
@@ -14,30 +15,14 @@ def serialize_task(task_obj):
     }
 
 
-@receiver(pre_save, sender=Task)
-def task_pre_save(sender, instance, **kwargs):
-    if instance.id:
-        try:
-            old_task = Task.objects.get(id=instance.id)
-            instance._old_status = old_task.status
-            instance._old_approver_id = old_task.approver_id
-        except Task.DoesNotExist:
-            pass
-
-
 @receiver(post_save, sender=Task)
 def task_post_save(sender, instance, created, **kwargs):
     payload = serialize_task(instance)
 
-    old_status = getattr(instance, "_old_status", None)
-    old_approver_id = getattr(instance, "_old_approver_id", None)
+    changes = instance.tracked_changes()
 
-    status_changed = created or (
-        old_status is not None and old_status != instance.status
-    )
-    approver_changed = (
-        old_approver_id is not None and old_approver_id != instance.approver_id
-    )
+    status_changed = created or "status" in changes
+    approver_changed = changes.get("approver_id") is not None
 
     if status_changed:
         # Notify the user their task status changed
@@ -50,3 +35,28 @@ def task_post_save(sender, instance, created, **kwargs):
     elif approver_changed and instance.status == 1 and instance.approver:
         # If task was already awaiting approval but was reassigned to another approver
         trigger_webhooks("task.sent_to_review", instance.approver, payload)
+
+
+@receiver(tasks_bulk_created, sender=Task)
+def tasks_bulk_created_handler(sender, tasks, **kwargs):
+    events = []
+    for task in tasks:
+        payload = serialize_task(task)
+        events.append(("task.status_changed", task.worksheet.user, payload))
+        if task.status == 1 and task.approver:
+            events.append(("task.sent_to_review", task.approver, payload))
+    trigger_webhooks_batch(events)
+
+
+@receiver(tasks_bulk_updated, sender=Task)
+def tasks_bulk_updated_handler(sender, changes, **kwargs):
+    events = []
+    for task, old_values in changes:
+        payload = serialize_task(task)
+        if "status" in old_values:
+            events.append(("task.status_changed", task.worksheet.user, payload))
+            if task.status == 1 and task.approver:
+                events.append(("task.sent_to_review", task.approver, payload))
+        elif "approver_id" in old_values and task.status == 1 and task.approver:
+            events.append(("task.sent_to_review", task.approver, payload))
+    trigger_webhooks_batch(events)
@@ -2,6 +2,7 @@ import hashlib
 import hmac
 import json
 import logging
+from collections import defaultdict
 from functools import partial
 
 import requests
@@ -43,17 +44,32 @@ def trigger_webhooks(event_type, target_user, payload):
     """
     Helper function to enqueue webhook tasks for a user's matched subscriptions.
     """
+    trigger_webhooks_batch([(event_type, target_user, payload)])
 
-    webhooks = Webhook.objects.filter(user=target_user, is_active=True)
-
-    for webhook in webhooks:
-        if event_type in webhook.events:
-            transaction.on_commit(
-                partial(
-                    send_webhook.enqueue,
-                    target_url=webhook.url,
-                    secret=webhook.secret,
-                    event_type=event_type,
-                    payload=payload,
+
+def trigger_webhooks_batch(events):
+    """
+    Enqueue webhook tasks for a list of (event_type, target_user, payload) events,
+    looking up the subscriptions of all target users with a single query.
+    """
+    if not events:
+        return
+
+    webhooks_by_user = defaultdict(list)
+    for webhook in Webhook.objects.filter(
+        user__in={target_user.id for _, target_user, _ in events}, is_active=True
+    ):
+        webhooks_by_user[webhook.user_id].append(webhook)
+
+    for event_type, target_user, payload in events:
+        for webhook in webhooks_by_user[target_user.id]:
+            if event_type in webhook.events:
+                transaction.on_commit(
+                    partial(
+                        send_webhook.enqueue,
+                        target_url=webhook.url,
+                        secret=webhook.secret,
+                        event_type=event_type,
+                        payload=payload,
+                    )
                 )
-            )
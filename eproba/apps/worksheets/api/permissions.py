@@ -1,34 +1,38 @@
 from rest_framework import permissions
 
+from apps.users.api.permissions import get_permission_context
+
+# Object checks compare ids against the request's permission context. Worksheets
+# should come with their owner and the owner's patrol loaded (tasks with those of
+# their worksheet), so that checking them costs no queries.
+
 
 class IsAllowedToManageWorksheetOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, worksheet):
         if request.method in permissions.SAFE_METHODS:
             return True
 
+        context = get_permission_context(request)
+        if context.user_id is not None and worksheet.supervisor_id == context.user_id:
+            return True
         return (
-            (
-                request.user.function >= 4
-                or (
-                    request.user.function >= 2
-                    and request.user.function >= worksheet.user.function
-                    and request.user != worksheet.user
-                )
+            context.function >= 4
+            or (
+                context.function >= 2
+                and context.function >= worksheet.user.function
+                and context.user_id != worksheet.user_id
             )
-            and request.user.patrol.team == worksheet.user.patrol.team
-        ) or worksheet.supervisor == request.user
+        ) and context.is_team_member(worksheet.user)
 
 
-class IsAllowedToManageTaskOrReadOnly(permissions.BasePermission):
+class IsAllowedToManageTaskOrReadOnly(IsAllowedToManageWorksheetOrReadOnly):
     def has_object_permission(self, request, view, task):
-        return IsAllowedToManageWorksheetOrReadOnly().has_object_permission(
-            request, view, task.worksheet
-        )
+        return super().has_object_permission(request, view, task.worksheet)
 
 
 class IsTaskOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, task):
-        return request.user == task.worksheet.user
+        return get_permission_context(request).user_id == task.worksheet.user_id
 
 
 class IsAllowedToReadOrManageTemplateWorksheet(permissions.BasePermission):
@@ -42,11 +46,15 @@ class IsAllowedToReadOrManageTemplateWorksheet(permissions.BasePermission):
         return request.user.function >= 3 or request.user.is_staff
 
     def has_object_permission(self, request, view, template_worksheet):
-        is_team_template = template_worksheet.team == request.user.patrol.team
+        context = get_permission_context(request)
+        is_team_template = (
+            context.team_id is not None
+            and template_worksheet.team_id == context.team_id
+        )
 
         is_org_template = (
-            template_worksheet.team is None
-            and template_worksheet.organization == request.user.patrol.team.organization
+            template_worksheet.team_id is None
+            and template_worksheet.organization == context.organization
         )
 
         if request.method in permissions.SAFE_METHODS:
@@ -58,20 +66,37 @@ class IsAllowedToReadOrManageTemplateWorksheet(permissions.BasePermission):
             )
 
         if is_team_template:
-            return request.user.function >= 3
+            return context.function >= 3
 
         return False
 
 
+class IsAllowedToInstantiateTemplateWorksheet(permissions.BasePermission):
+    """Creating worksheets from a template only needs read access to it."""
+
+    def has_permission(self, request, view):
+        if not request.user.patrol:
+            return False
+        return request.user.function >= 2 or request.user.is_staff
+
+    def has_object_permission(self, request, view, template_worksheet):
+        context = get_permission_context(request)
+        if context.team_id is None:
+            return False
+        return template_worksheet.team_id == context.team_id or (
+            template_worksheet.team_id is None
+            and template_worksheet.organization == context.organization
+        )
+
+
 class IsAllowedToAccessWorksheetNotes(permissions.BasePermission):
     def has_object_permission(self, request, view, worksheet):
+        context = get_permission_context(request)
         return (
-            request.user.function >= 4 or worksheet.supervisor == request.user
-        ) and request.user != worksheet.user
+            context.function >= 4 or worksheet.supervisor_id == context.user_id
+        ) and context.user_id != worksheet.user_id
 
 
-class IsAllowedToAccessTaskNotes(permissions.BasePermission):
+class IsAllowedToAccessTaskNotes(IsAllowedToAccessWorksheetNotes):
     def has_object_permission(self, request, view, task):
-        return IsAllowedToAccessWorksheetNotes().has_object_permission(
-            request, view, task.worksheet
-        )
+        return super().has_object_permission(request, view, task.worksheet)
@@ -1,21 +1,29 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
 
 from apps.users.api.serializers import PublicUserSerializer
 from apps.users.models import User
+from apps.worksheets.images import IMAGE_VARIANT_SIZES
 from apps.worksheets.models import (
+    TASK_COUNT_FIELDS,
     Task,
     TemplateTask,
     TemplateTaskGroup,
     TemplateWorksheet,
     Worksheet,
+    update_task_counts,
 )
+from apps.worksheets.signals import tasks_bulk_created, tasks_bulk_updated
+from apps.worksheets.sync import record_task_tombstones
+from apps.worksheets.utils import apply_row_changes
 
 
 class ScopeField(serializers.Field):
     def to_representation(self, obj):
         if obj.organization is not None:
             return "organization"
-        elif obj.team is not None:
+        elif obj.team_id is not None:
             return "team"
         return None
 
@@ -33,6 +41,41 @@ class ScopeField(serializers.Field):
         raise serializers.ValidationError("Invalid scope value.")
 
 
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized variants of a template image.
+
+    Null until the variants of the current image were generated. File names
+    carry a hash of their content, so the URLs can be cached forever.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.update(source="*", read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, template):
+        variants = template.image_variants
+        if not template.image or variants.get("source") != template.image.name:
+            return None
+
+        request = self.context.get("request")
+
+        def get_url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            variant: {
+                "width": variants[variant]["width"],
+                "height": variants[variant]["height"],
+                "webp": get_url(variants[variant]["webp"]),
+                "fallback": get_url(variants[variant]["fallback"]),
+            }
+            for variant in IMAGE_VARIANT_SIZES
+            if variant in variants
+        }
+
+
 class TaskSerializer(serializers.ModelSerializer):
     """Serializer for a Task model with improved maintainability."""
 
@@ -91,6 +134,24 @@ class TaskSerializer(serializers.ModelSerializer):
         return instance
 
 
+class TaskReviewSerializer(serializers.Serializer):
+    """A single task decision of a batch review."""
+
+    id = serializers.UUIDField()
+    action = serializers.ChoiceField(choices=["accept", "reject"])
+
+
+class TaskReviewBatchSerializer(serializers.Serializer):
+    """Serializer for reviewing many tasks at once."""
+
+    tasks = TaskReviewSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_tasks(self, value):
+        if len({item["id"] for item in value}) != len(value):
+            raise serializers.ValidationError("Each task can be reviewed only once.")
+        return value
+
+
 class TemplateTaskSerializer(serializers.ModelSerializer):
     """Serializer for TemplateTask model."""
 
@@ -104,17 +165,101 @@ class TemplateTaskSerializer(serializers.ModelSerializer):
 class TemplateTaskGroupSerializer(serializers.ModelSerializer):
     """Serializer for TemplateTaskGroup model."""
 
+    tasks = serializers.SerializerMethodField()
+
     class Meta:
         model = TemplateTaskGroup
         fields = ["id", "name", "description", "min_tasks", "max_tasks", "tasks"]
 
+    def get_tasks(self, group) -> list[str]:
+        # Picked from the template's tasks, which are usually prefetched,
+        # instead of querying the tasks of every group
+        return [
+            task.pk for task in group.template.tasks.all() if task.group_id == group.pk
+        ]
+
+
+class TemplateInstantiateSerializer(serializers.Serializer):
+    """Input of creating a worksheet from a template."""
+
+    user_id = serializers.UUIDField(required=False)
+    task_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list, max_length=1000
+    )
+
+    def validate_user_id(self, value):
+        user = User.objects.select_related("patrol__team").filter(id=value).first()
+        if user is None:
+            raise serializers.ValidationError("User does not exist")
+        return user
+
+
+class TemplateAssignSerializer(serializers.Serializer):
+    """Input of assigning a template to a patrol, a team or a list of users."""
+
+    patrol_id = serializers.UUIDField(required=False)
+    team_id = serializers.UUIDField(required=False)
+    user_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, max_length=1000
+    )
+    task_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list, max_length=1000
+    )
+
+    def validate(self, attrs):
+        targets = [
+            name for name in ("patrol_id", "team_id", "user_ids") if name in attrs
+        ]
+        if len(targets) != 1:
+            raise serializers.ValidationError(
+                "Provide exactly one of patrol_id, team_id or user_ids."
+            )
+
+        # Worksheets can only be assigned within the team of the current user
+        team = self.context["request"].user.patrol.team
+        users = User.objects.filter(patrol__team=team, is_active=True)
+        if "patrol_id" in attrs:
+            if not team.patrols.filter(id=attrs["patrol_id"]).exists():
+                raise serializers.ValidationError(
+                    {"patrol_id": "Patrol not found in your team."}
+                )
+            users = users.filter(patrol_id=attrs["patrol_id"])
+        elif "team_id" in attrs:
+            if attrs["team_id"] != team.id:
+                raise serializers.ValidationError(
+                    {"team_id": "You can only assign worksheets in your own team."}
+                )
+        else:
+            users = users.filter(id__in=attrs["user_ids"])
+
+        attrs["users"] = list(users)
+        if "user_ids" in attrs:
+            missing = set(attrs["user_ids"]) - {user.id for user in attrs["users"]}
+            if missing:
+                raise serializers.ValidationError(
+                    {
+                        "user_ids": "Users not found in your team: "
+                        + ", ".join(sorted(str(user_id) for user_id in missing))
+                    }
+                )
+        return attrs
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Query parameters of the search endpoint."""
+
+    q = serializers.CharField(min_length=2, max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
 
 class TemplateWorksheetSummarySerializer(serializers.ModelSerializer):
     """Serializer for template summary without tasks - used for linking templates to worksheets."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = TemplateWorksheet
-        fields = ["id", "name", "description", "image"]
+        fields = ["id", "name", "description", "image", "image_variants"]
 
 
 class WorksheetSerializer(serializers.ModelSerializer):
@@ -157,6 +302,10 @@ class WorksheetSerializer(serializers.ModelSerializer):
             "template_id",
             "final_challenge",
             "final_challenge_description",
+            "task_count",
+            "completed_task_count",
+            "pending_task_count",
+            "rejected_task_count",
         ]
 
     def to_representation(self, instance):
@@ -175,6 +324,10 @@ class WorksheetSerializer(serializers.ModelSerializer):
                     "is_archived": False,
                     "notes": "",
                     "description": "",
+                    "task_count": 0,
+                    "completed_task_count": 0,
+                    "pending_task_count": 0,
+                    "rejected_task_count": 0,
                 }
             )
 
@@ -194,39 +347,54 @@ class WorksheetSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("User does not exist")
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         # Extract tasks data before creating worksheet
         tasks_data = validated_data.pop("tasks", [])
 
         # Handle template relationship
         template_data = validated_data.pop("template", None)
+        if template_data and template_data.get("id"):
+            validated_data["template"] = TemplateWorksheet.objects.filter(
+                id=template_data["id"]
+            ).first()
 
         # Create worksheet instance
         worksheet = Worksheet.objects.create(**validated_data)
 
-        # Set template if provided
-        if template_data and template_data.get("id"):
-            try:
-                template = TemplateWorksheet.objects.get(id=template_data["id"])
-                worksheet.template = template
-                worksheet.save()
-            except TemplateWorksheet.DoesNotExist:
-                pass
-
         # Create tasks
         self._create_tasks(worksheet, tasks_data)
 
         return worksheet
 
     def _create_tasks(self, worksheet, tasks_data):
-        """Create tasks for a worksheet using TaskSerializer."""
-        for task_data in tasks_data:
-            if task_data.get("task"):  # Only create if task name exists
-                task_data["worksheet"] = worksheet.id
-                task_serializer = TaskSerializer(data=task_data, context=self.context)
-                task_serializer.is_valid(raise_exception=True)
-                task_serializer.save()
+        """
+        Insert tasks of a new worksheet with a single query.
 
+        Tasks were already validated by the nested TaskSerializer, and the
+        worksheet was just created, so neither needs saving again per task.
+        """
+        tasks = Task.objects.bulk_create(
+            [
+                Task(worksheet=worksheet, **self._clean_task_data(task_data))
+                for task_data in tasks_data
+                if task_data.get("task")  # Only create if task name exists
+            ]
+        )
+        if tasks:
+            self._update_task_counts(worksheet)
+            tasks_bulk_created.send(sender=Task, tasks=tasks)
+
+    @staticmethod
+    def _clean_task_data(task_data):
+        """Drop write-only helpers from validated task data, applying clear_status."""
+        task_data = dict(task_data)
+        task_data.pop("worksheet", None)
+        if task_data.pop("clear_status", False):
+            task_data.update(status=0, approval_date=None, approver=None)
+        return task_data
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         # Extract tasks data before updating worksheet
         tasks_data = validated_data.pop("tasks", None)
@@ -253,37 +421,64 @@ class WorksheetSerializer(serializers.ModelSerializer):
 
     def _update_tasks(self, worksheet, tasks_data):
         """
-        Update tasks for a worksheet using TaskSerializer.
+        Apply the submitted task list to a worksheet as a set-based diff.
+
+        Only tasks whose values changed are written and reported to webhooks.
         """
-        # Get current tasks mapped by ID for efficient lookup
-        existing_tasks = {task.id: task for task in worksheet.tasks.all()}
+        changes = apply_row_changes(
+            worksheet.tasks.all(),
+            [self._clean_task_data(task_data) for task_data in tasks_data],
+            build_row=lambda task_data: self._build_new_task(worksheet, task_data),
+        )
+
+        if (
+            changes.created
+            or changes.deleted_ids
+            or any("status" in old_values for _, old_values in changes.updated)
+        ):
+            self._update_task_counts(worksheet)
+        if changes.created:
+            tasks_bulk_created.send(sender=Task, tasks=changes.created)
+        if changes.updated:
+            tasks_bulk_updated.send(sender=Task, changes=changes.updated)
+        if changes.deleted_ids:
+            record_task_tombstones(worksheet, changes.deleted_ids)
+
+    @staticmethod
+    def _update_task_counts(worksheet):
+        update_task_counts([worksheet.pk])
+        worksheet.refresh_from_db(fields=TASK_COUNT_FIELDS)
+
+    @staticmethod
+    def _build_new_task(worksheet, task_data):
+        # Partial updates do not enforce required fields on nested items
+        if not task_data.get("task"):
+            raise serializers.ValidationError(
+                {"tasks": [{"task": ["This field is required."]}]}
+            )
+        return Task(worksheet=worksheet, **task_data)
 
-        # Track which task IDs are being updated/created
-        processed_task_ids = set()
 
-        for task_data in tasks_data:
-            task_id = task_data.get("id")
-
-            if task_id and task_id in existing_tasks:
-                # Update existing task using TaskSerializer
-                processed_task_ids.add(task_id)
-                task_instance = existing_tasks[task_id]
-                task_serializer = TaskSerializer(
-                    task_instance, data=task_data, context=self.context, partial=True
-                )
-                task_serializer.is_valid(raise_exception=True)
-                task_serializer.save(worksheet=worksheet)
-            else:
-                # Create new task using TaskSerializer
-                task_serializer = TaskSerializer(data=task_data, context=self.context)
-                task_serializer.is_valid(raise_exception=True)
-                saved_task = task_serializer.save(worksheet=worksheet)
-                processed_task_ids.add(str(saved_task.id))
+class ReviewInboxWorksheetSerializer(serializers.ModelSerializer):
+    """Worksheet with only the tasks waiting for the reviewer, set as `pending_tasks`."""
 
-        # Remove tasks that are no longer in the data
-        task_ids_to_remove = set(existing_tasks.keys()) - processed_task_ids
-        if task_ids_to_remove:
-            worksheet.tasks.filter(id__in=task_ids_to_remove).delete()
+    user = PublicUserSerializer(read_only=True)
+    pending_tasks = TaskSerializer(many=True, read_only=True)
+    pending_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Worksheet
+        fields = [
+            "id",
+            "name",
+            "user",
+            "updated_at",
+            "pending_count",
+            "pending_tasks",
+        ]
+
+    def get_pending_count(self, obj) -> int:
+        return len(obj.pending_tasks)
 
 
 class TemplateWorksheetSerializer(serializers.ModelSerializer):
@@ -292,6 +487,7 @@ class TemplateWorksheetSerializer(serializers.ModelSerializer):
     tasks = TemplateTaskSerializer(many=True, required=False)
     task_groups = TemplateTaskGroupSerializer(many=True, required=False, read_only=True)
     scope = ScopeField(source="*")
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = TemplateWorksheet
@@ -301,6 +497,7 @@ class TemplateWorksheetSerializer(serializers.ModelSerializer):
             "description",
             "template_notes",
             "image",
+            "image_variants",
             "tasks",
             "created_at",
             "updated_at",
@@ -309,6 +506,7 @@ class TemplateWorksheetSerializer(serializers.ModelSerializer):
             "task_groups",
         ]
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a template worksheet with nested template tasks."""
         # Extract tasks data before creating template worksheet
@@ -344,6 +542,7 @@ class TemplateWorksheetSerializer(serializers.ModelSerializer):
                 task_serializer.is_valid(raise_exception=True)
                 task_serializer.save(template=template_worksheet)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a template worksheet with nested template tasks."""
         # Extract tasks data before updating template worksheet
@@ -366,39 +565,15 @@ class TemplateWorksheetSerializer(serializers.ModelSerializer):
 
     def _update_template_tasks(self, template_worksheet, tasks_data):
         """
-        Update template tasks for a template worksheet using TemplateTaskSerializer.
+        Apply the submitted template task list as a set-based diff.
         """
-        # Get current template tasks mapped by ID for efficient lookup
-        existing_tasks = {task.id: task for task in template_worksheet.tasks.all()}
-
-        # Track which task IDs are being updated/created
-        processed_task_ids = set()
-
-        for task_data in tasks_data:
-            task_id = task_data.get("id")
-
-            if task_id and task_id in existing_tasks:
-                # Update existing template task using TemplateTaskSerializer
-                processed_task_ids.add(task_id)
-                task_instance = existing_tasks[task_id]
-                task_serializer = TemplateTaskSerializer(
-                    task_instance, data=task_data, context=self.context, partial=True
-                )
-                task_serializer.is_valid(raise_exception=True)
-                task_serializer.save(template=template_worksheet)
-            else:
-                # Create new template task using TemplateTaskSerializer
-                task_serializer = TemplateTaskSerializer(
-                    data=task_data, context=self.context
-                )
-                task_serializer.is_valid(raise_exception=True)
-                saved_task = task_serializer.save(template=template_worksheet)
-                processed_task_ids.add(str(saved_task.id))
-
-        # Remove template tasks that are no longer in the data
-        task_ids_to_remove = set(existing_tasks.keys()) - processed_task_ids
-        if task_ids_to_remove:
-            template_worksheet.tasks.filter(id__in=task_ids_to_remove).delete()
+        apply_row_changes(
+            template_worksheet.tasks.all(),
+            tasks_data,
+            build_row=lambda task_data: TemplateTask(
+                template=template_worksheet, **task_data
+            ),
+        )
 
     def validate(self, attrs):
         """Custom validation for TemplateWorksheet."""
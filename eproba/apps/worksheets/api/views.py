@@ -1,42 +1,80 @@
 import json
-from datetime import datetime
+from collections import defaultdict
+from datetime import UTC, datetime
 
-from django.db.models import Q
-from django.http import HttpResponse, QueryDict
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import QueryDict
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import MethodNotAllowed, ParseError, PermissionDenied
+from rest_framework.exceptions import (
+    MethodNotAllowed,
+    NotFound,
+    ParseError,
+    PermissionDenied,
+)
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from unidecode import unidecode
 
+from apps.core.api.pagination import KeysetPagination
+from apps.core.api.permissions import TokenHasRequiredScope
 from apps.users.api.serializers import PublicUserSerializer
+from apps.users.directory import get_team_approvers
 from apps.users.models import User
-from apps.users.tasks import clear_tokens
 from apps.users.utils import send_notification
-from apps.worksheets.models import Task, TemplateWorksheet, Worksheet
-from apps.worksheets.tasks import remove_expired_deleted_worksheets
-
-try:
-    from weasyprint import HTML
-except (OSError, ImportError):
-    HTML = None
-from apps.core.api.permissions import TokenHasRequiredScope
+from apps.worksheets.catalogue import get_cached_catalogue, get_catalogue_version
+from apps.worksheets.models import (
+    Task,
+    TemplateTask,
+    TemplateWorksheet,
+    Worksheet,
+    touch_worksheets,
+    update_task_counts,
+)
+from apps.worksheets.pdf import (
+    can_render_pdf,
+    get_pdf_job,
+    get_printable_queryset,
+    pdf_response,
+    pdf_unavailable_response,
+    pdf_zip_response,
+    start_pdf_job,
+)
+from apps.worksheets.search import search
+from apps.worksheets.services import assign_template, instantiate_template
+from apps.worksheets.signals import tasks_bulk_updated
+from apps.worksheets.sync import (
+    get_sync_scope,
+    get_visible_tombstones,
+    is_sync_cursor_expired,
+    make_sync_cursor,
+    read_sync_cursor,
+)
 
 from .permissions import (
     IsAllowedToAccessTaskNotes,
     IsAllowedToAccessWorksheetNotes,
+    IsAllowedToInstantiateTemplateWorksheet,
     IsAllowedToManageTaskOrReadOnly,
     IsAllowedToManageWorksheetOrReadOnly,
     IsAllowedToReadOrManageTemplateWorksheet,
     IsTaskOwner,
 )
 from .serializers import (
+    ReviewInboxWorksheetSerializer,
+    SearchQuerySerializer,
+    TaskReviewBatchSerializer,
     TaskSerializer,
+    TemplateAssignSerializer,
+    TemplateInstantiateSerializer,
     TemplateWorksheetSerializer,
     WorksheetSerializer,
 )
@@ -45,96 +83,144 @@ from .serializers import (
 # Helper functions for PDF generation
 def print_worksheet(request, id):
     """Generate PDF for a worksheet."""
-    worksheet = get_object_or_404(Worksheet, id=id)
-    # Prepare task lists ordered by 'order'
-    tasks_qs = worksheet.tasks.all().order_by("order")
-    general_tasks = list(tasks_qs.filter(category="general"))
-    individual_tasks = list(tasks_qs.filter(category="individual"))
-    has_both = bool(general_tasks) and bool(individual_tasks)
-
-    if HTML is None:
-        return HttpResponse(
-            "Weasyprint is not installed, PDF generation is not possible.\nContact the administrator for help.",
-            content_type="text/plain",
-            status=500,
-        )
+    worksheet = get_object_or_404(get_printable_queryset(Worksheet), id=id)
+    if request.GET.get("async"):
+        return start_pdf_job_response(request, worksheet)
+    return pdf_response(request, worksheet)
 
-    try:
-        response = HttpResponse(
-            HTML(
-                string=render_to_string(
-                    "worksheets/worksheet_pdf.html",
-                    {
-                        "worksheet": worksheet,
-                        "all_tasks": list(tasks_qs),
-                        "general_tasks": general_tasks,
-                        "individual_tasks": individual_tasks,
-                        "has_both_categories": has_both,
-                    },
-                ),
-                base_url=request.build_absolute_uri(),
-            ).write_pdf(),
-            content_type="application/pdf",
-        )
-    except Exception as e:
-        return HttpResponse(
-            f"Error generating PDF: {e!s}",
-            content_type="text/plain",
-            status=500,
-        )
 
-    response["Content-Disposition"] = (
-        f'inline; filename="{unidecode(str(worksheet))} - Epróba.pdf"'
+def print_worksheet_template(request, id):
+    """Generate PDF for a worksheet template."""
+    worksheet_template = get_object_or_404(
+        get_printable_queryset(TemplateWorksheet), id=id
     )
-    return response
+    if request.GET.get("async"):
+        return start_pdf_job_response(request, worksheet_template, is_template=True)
+    return pdf_response(request, worksheet_template, is_template=True)
 
 
-def print_worksheet_template(request, id):
-    """Generate PDF for a worksheet template."""
-    worksheet_template = get_object_or_404(TemplateWorksheet, id=id)
-
-    # Template tasks ordered by 'order'
-    tasks_qs = worksheet_template.tasks.all().order_by("order")
-    general_tasks = list(tasks_qs.filter(category="general"))
-    individual_tasks = list(tasks_qs.filter(category="individual"))
-    has_both = bool(general_tasks) and bool(individual_tasks)
-
-    if HTML is None:
-        return HttpResponse(
-            "Weasyprint is not installed, PDF generation is not possible.\nContact the administrator for help.",
-            content_type="text/plain",
-            status=500,
+def start_pdf_job_response(request, obj, *, is_template=False):
+    if not can_render_pdf():
+        return pdf_unavailable_response()
+    return pdf_job_response(
+        request, start_pdf_job(request, obj, is_template=is_template)
+    )
+
+
+def pdf_job_response(request, job_id):
+    """
+    Report the state of a PDF job.
+
+    Pending jobs answer 202 with the job URL to poll, ready jobs redirect (303)
+    to the PDF, failed jobs report the error.
+    """
+    job = get_pdf_job(job_id)
+    if job is None:
+        raise NotFound("PDF job not found")
+
+    data = {
+        "status": job["status"],
+        "job": request.build_absolute_uri(reverse("pdf_job", args=[job_id])),
+    }
+    if job["status"] == "ready":
+        data["url"] = job["pdf_url"]
+        return Response(
+            data, status=status.HTTP_303_SEE_OTHER, headers={"Location": job["pdf_url"]}
         )
+    if job["status"] == "failed":
+        data["detail"] = job["detail"]
+        return Response(data)
+    return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Retry-After": "2"})
 
-    try:
-        response = HttpResponse(
-            HTML(
-                string=render_to_string(
-                    "worksheets/worksheet_pdf.html",
-                    {
-                        "worksheet": worksheet_template,
-                        "is_template": True,
-                        "all_tasks": list(tasks_qs),
-                        "general_tasks": general_tasks,
-                        "individual_tasks": individual_tasks,
-                        "has_both_categories": has_both,
-                    },
-                ),
-                base_url=request.build_absolute_uri(),
-            ).write_pdf(),
-            content_type="application/pdf",
+
+class PdfJobView(APIView):
+    """Polling endpoint for PDFs requested with `?async=1`."""
+
+    permission_classes = [AllowAny]
+
+    def get(self, request, job_id):
+        return pdf_job_response(request, job_id)
+
+
+class SearchView(APIView):
+    """
+    Full-text search over the worksheets and templates visible to the user.
+
+    Matches names and descriptions of worksheets, templates and their tasks,
+    ignoring case and Polish diacritics. Results come best match first, each
+    with the tasks that matched.
+    """
+
+    permission_classes = [IsAuthenticated, TokenHasRequiredScope]
+    required_scopes = ["worksheets"]
+
+    def get_worksheets(self):
+        user = self.request.user
+        visible = Q(user=user) | Q(supervisor=user)
+        if user.patrol and user.function >= 2:
+            visible |= Q(user__patrol__team_id=user.patrol.team_id)
+        return Worksheet.objects.filter(visible, deleted=False)
+
+    def get_templates(self):
+        user = self.request.user
+        if not user.patrol or (user.function < 2 and not user.is_staff):
+            return TemplateWorksheet.objects.none()
+        return TemplateWorksheet.objects.filter(
+            Q(team_id=user.patrol.team_id)
+            | Q(team=None, organization=user.patrol.team.organization)
         )
-    except Exception as e:
-        return HttpResponse(
-            f"Error generating PDF: {e!s}",
-            content_type="text/plain",
-            status=500,
+
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        results = search(
+            params.validated_data["q"],
+            self.get_worksheets(),
+            self.get_templates(),
+            limit=params.validated_data["limit"],
         )
 
-    response["Content-Disposition"] = (
-        f'inline; filename="{unidecode(str(worksheet_template))} - Epróba.pdf"'
-    )
-    return response
+        ids = defaultdict(list)
+        for result in results:
+            ids[result.kind].append(result.id)
+            ids[f"{result.kind}_task"].extend(result.task_ids)
+        worksheets = Worksheet.objects.select_related("user__patrol__team").in_bulk(
+            ids["worksheet"]
+        )
+        templates = TemplateWorksheet.objects.only("id", "name").in_bulk(
+            ids["template"]
+        )
+        task_names = dict(
+            Task.objects.filter(id__in=ids["worksheet_task"]).values_list("id", "task")
+        ) | dict(
+            TemplateTask.objects.filter(id__in=ids["template_task"]).values_list(
+                "id", "task"
+            )
+        )
+
+        data = []
+        for result in results:
+            item = {"type": result.kind, "id": result.id, "rank": result.rank}
+            if result.kind == "worksheet":
+                # Deleted since the index was read
+                if (worksheet := worksheets.get(result.id)) is None:
+                    continue
+                item.update(
+                    name=worksheet.name,
+                    user=PublicUserSerializer(worksheet.user).data,
+                    is_archived=worksheet.is_archived,
+                )
+            else:
+                if (template := templates.get(result.id)) is None:
+                    continue
+                item["name"] = template.name
+            item["tasks"] = [
+                {"id": task_id, "task": task_names[task_id]}
+                for task_id in result.task_ids
+                if task_id in task_names
+            ]
+            data.append(item)
+        return Response({"results": data})
 
 
 class MultipartNestedSupportMixin:
@@ -207,16 +293,33 @@ class WorksheetViewSet(viewsets.ModelViewSet):
     required_scopes = ["worksheets"]
     serializer_class = WorksheetSerializer
     lookup_field = "id"
+    pagination_class = KeysetPagination
+    pagination_ordering = ("-updated_at", "-id")
+
+    def get_base_queryset(self):
+        # Everything WorksheetSerializer walks is loaded up front, so listing
+        # costs the same number of queries regardless of the number of worksheets.
+        return Worksheet.objects.select_related(
+            "user__patrol__team", "supervisor__patrol__team", "template"
+        ).prefetch_related(
+            Prefetch(
+                "tasks",
+                queryset=Task.objects.select_related("approver__patrol__team"),
+            )
+        )
 
     def get_queryset(self):
-        qs = Worksheet.objects.all()
+        qs = self.get_base_queryset()
         if self.action == "retrieve":
             return qs.filter(deleted=False)
 
         user = self.request.user
+        # Deprecated in favour of the cursor returned by the `sync` action
         last_sync = self.request.query_params.get("last_sync")
         if last_sync:
-            qs = qs.filter(updated_at__gt=datetime.fromtimestamp(int(last_sync)))
+            qs = qs.filter(
+                updated_at__gt=datetime.fromtimestamp(float(last_sync), tz=UTC)
+            )
         if self.request.query_params.get("user") is not None:
             return qs.filter(user=user)
         if self.request.query_params.get("archived") is not None:
@@ -234,12 +337,16 @@ class WorksheetViewSet(viewsets.ModelViewSet):
                 | Q(team=None, organization=user.patrol.team.organization)
             )
         if user.patrol and user.function >= 2:
-            return qs.filter(
-                Q(user__patrol__team=user.patrol.team, is_archived=False)
-                | Q(supervisor=user, is_archived=False)
-            )
+            return qs.filter(self.get_leader_visibility(user), is_archived=False)
         return qs.filter(user=user, is_archived=False)
 
+    @staticmethod
+    def get_leader_visibility(user):
+        # Team members are matched by id rather than joined, so the database can
+        # combine the user and supervisor indexes instead of scanning worksheets.
+        team_members = User.objects.filter(patrol__team_id=user.patrol.team_id)
+        return Q(user__in=team_members) | Q(supervisor=user)
+
     def get_serializer_class(self):
         # This is here for backward compatibility
         if self.request.query_params.get("templates") is not None:
@@ -249,7 +356,6 @@ class WorksheetViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         instance.deleted = True
         instance.save()
-        remove_expired_deleted_worksheets()  # remove worksheets deleted more than 30 days ago, it's here as a temporary solution
 
     def perform_create(self, serializer):
         user_data = serializer.validated_data.get("user")
@@ -287,6 +393,233 @@ class WorksheetViewSet(viewsets.ModelViewSet):
             serializer.validated_data["user"] = user
         serializer.save()
 
+    def get_sync_queryset(self):
+        """
+        Every worksheet the user can see, archived and soft-deleted ones included.
+
+        Unlike the list, it ignores the list filters, so delta clients receive
+        archiving and deletion as changes of the `is_archived` and `deleted` flags.
+        """
+        user = self.request.user
+        visible = Q(user=user)
+        if user.patrol and user.function >= 2:
+            visible = self.get_leader_visibility(user)
+        return self.get_base_queryset().filter(visible)
+
+    @action(detail=False, methods=["get"], url_path="sync")
+    def sync(self, request):
+        """
+        Delta sync of worksheets.
+
+        Without `since` returns every worksheet visible to the user. With `since`
+        set to the `cursor` of a previous response returns only worksheets changed
+        since then, along with ids of worksheets and tasks deleted in the meantime.
+        Worksheets the user stopped seeing, e.g. after a change of supervisor or
+        of the owner's team, are reported as deleted too. When `reset` is true
+        the client should replace its local copy, as happens after a change of
+        the user's own team or function.
+        """
+        issued_at = timezone.now()
+        scope = get_sync_scope(request.user)
+        worksheets = self.get_sync_queryset()
+        tombstones = get_visible_tombstones(request.user)
+
+        since = request.query_params.get("since")
+        reset = True
+        if since:
+            try:
+                changed_after, cursor_scope = read_sync_cursor(since)
+            except ValueError as e:
+                raise ParseError(str(e))
+            if cursor_scope == scope and not is_sync_cursor_expired(changed_after):
+                reset = False
+                tombstones = tombstones.filter(deleted_at__gt=changed_after)
+
+        deleted = {"worksheets": [], "tasks": []}
+        if not reset:
+            for kind, object_id in tombstones.values_list("kind", "object_id"):
+                deleted[f"{kind}s"].append(object_id)
+            # Worksheets lost through one relation may still be visible through
+            # another, e.g. to a supervisor who is also a leader of the team
+            still_visible = set(
+                worksheets.filter(id__in=deleted["worksheets"])
+                .prefetch_related(None)
+                .values_list("id", flat=True)
+            )
+            deleted["worksheets"] = [
+                worksheet_id
+                for worksheet_id in dict.fromkeys(deleted["worksheets"])
+                if worksheet_id not in still_visible
+            ]
+            worksheets = worksheets.filter(updated_at__gt=changed_after)
+
+        return Response(
+            {
+                "cursor": make_sync_cursor(issued_at, scope),
+                "reset": reset,
+                "worksheets": WorksheetSerializer(
+                    worksheets, many=True, context=self.get_serializer_context()
+                ).data,
+                "deleted": deleted,
+            }
+        )
+
+    def get_pending_review_tasks(self):
+        # Served by the (approver, status) index on Task
+        return Task.objects.filter(
+            approver=self.request.user, status=1, worksheet__deleted=False
+        )
+
+    @action(detail=False, methods=["get"], url_path="review/inbox")
+    def review_inbox(self, request):
+        """
+        Tasks waiting for the current user's review, grouped by worksheet.
+
+        Worksheets come with only their pending tasks, ordered by submission.
+        """
+        worksheets = {}
+        for task in (
+            self.get_pending_review_tasks()
+            .select_related("worksheet__user__patrol__team", "approver__patrol__team")
+            .order_by("approval_date", "order")
+        ):
+            worksheet = worksheets.get(task.worksheet_id)
+            if worksheet is None:
+                worksheet = worksheets[task.worksheet_id] = task.worksheet
+                worksheet.pending_tasks = []
+            worksheet.pending_tasks.append(task)
+            task.worksheet = worksheet
+
+        serializer = ReviewInboxWorksheetSerializer(
+            worksheets.values(), many=True, context=self.get_serializer_context()
+        )
+        return Response(
+            {
+                "count": sum(len(w.pending_tasks) for w in worksheets.values()),
+                "worksheets": serializer.data,
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="review/count")
+    def review_count(self, request):
+        """Number of tasks waiting for the current user's review, for badges."""
+        return Response({"count": self.get_pending_review_tasks().count()})
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Download PDFs of many worksheets as a ZIP archive streamed while rendering.
+
+        Exports every active worksheet visible to the user, narrowed down with
+        `team`, `patrol` or a comma separated list of worksheet `ids`.
+        """
+        if not can_render_pdf():
+            return pdf_unavailable_response()
+
+        worksheets = get_printable_queryset(Worksheet).filter(
+            id__in=self.get_queryset().filter(deleted=False).values("id")
+        )
+        try:
+            if team := request.query_params.get("team"):
+                worksheets = worksheets.filter(user__patrol__team_id=team)
+            if patrol := request.query_params.get("patrol"):
+                worksheets = worksheets.filter(user__patrol_id=patrol)
+            if ids := request.query_params.get("ids"):
+                worksheets = worksheets.filter(id__in=ids.split(","))
+        except ValidationError:
+            raise ParseError("Invalid team, patrol or worksheet id")
+
+        worksheets = list(worksheets.order_by("user__patrol__name", "name"))
+        if not worksheets:
+            raise NotFound("No worksheets to export")
+
+        return pdf_zip_response(
+            worksheets,
+            request.build_absolute_uri("/"),
+            f"Epróba - {timezone.localdate().isoformat()}.zip",
+        )
+
+    @action(detail=False, methods=["post"], url_path="review/batch")
+    def review_batch(self, request):
+        """
+        Accept or reject many tasks at once.
+
+        Takes `{"tasks": [{"id": ..., "action": "accept" | "reject"}, ...]}`. Either
+        every task is reviewed or, when any of them is missing or not manageable
+        by the user, none is. Each worksheet owner gets a single notification.
+        """
+        serializer = TaskReviewBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        actions = {
+            item["id"]: item["action"] for item in serializer.validated_data["tasks"]
+        }
+
+        tasks = list(
+            Task.objects.select_related("worksheet__user__patrol").filter(
+                id__in=actions, worksheet__deleted=False
+            )
+        )
+        missing = actions.keys() - {task.id for task in tasks}
+        if missing:
+            raise NotFound(
+                f"Tasks not found: {', '.join(sorted(str(id) for id in missing))}"
+            )
+
+        worksheets = {task.worksheet_id: task.worksheet for task in tasks}
+        permission = IsAllowedToManageWorksheetOrReadOnly()
+        for worksheet in worksheets.values():
+            if not permission.has_object_permission(request, self, worksheet):
+                raise PermissionDenied(
+                    f"You can't review tasks of worksheet {worksheet.id}"
+                )
+
+        now = timezone.now()
+        # Per worksheet owner: [accepted, rejected, worksheet ids]
+        reviewed = defaultdict(lambda: [0, 0, set()])
+        for task in tasks:
+            old_status = task.status
+            accepted = actions[task.id] == "accept"
+            task.status = 2 if accepted else 3
+            task.approver = request.user
+            task.approval_date = now
+
+            owner = task.worksheet.user
+            # Same conditions as the single task accept/reject actions
+            if owner != request.user and (
+                old_status != 2 if accepted else old_status not in [0, 3]
+            ):
+                summary = reviewed[owner]
+                summary[0 if accepted else 1] += 1
+                summary[2].add(task.worksheet_id)
+
+        changes = [(task, task.tracked_changes()) for task in tasks]
+        with transaction.atomic():
+            Task.objects.bulk_update(tasks, ["status", "approver", "approval_date"])
+            update_task_counts(worksheets)
+            touch_worksheets(worksheets)
+            tasks_bulk_updated.send(
+                sender=Task,
+                changes=[
+                    (task, old_values) for task, old_values in changes if old_values
+                ],
+            )
+
+        for owner, (accepted, rejected, worksheet_ids) in reviewed.items():
+            send_notification(
+                targets=owner,
+                title="Twoje zadania zostały sprawdzone",
+                body=f"Zaakceptowane: {accepted}, odrzucone: {rejected}. Sprawdzający: {request.user}",
+                link=(
+                    f"worksheets#{next(iter(worksheet_ids))}"
+                    if len(worksheet_ids) == 1
+                    else "worksheets"
+                ),
+            )
+
+        return Response(
+            TaskSerializer(tasks, many=True, context=self.get_serializer_context()).data
+        )
+
     @action(
         detail=True,
         methods=["post", "put", "delete"],
@@ -355,10 +688,42 @@ class TemplateWorksheetViewSet(MultipartNestedSupportMixin, ModelViewSet):
     def get_queryset(self):
         if not self.request.user.patrol:
             return TemplateWorksheet.objects.none()
+        # Group tasks are taken from the prefetched template tasks, so any number
+        # of templates is serialized with three queries
         return TemplateWorksheet.objects.filter(
             Q(team=self.request.user.patrol.team)
             | Q(team=None, organization=self.request.user.patrol.team.organization)
+        ).prefetch_related("tasks", "task_groups")
+
+    def list(self, request, *args, **kwargs):
+        """
+        Templates of the user's team and organization.
+
+        The serialized catalogue is cached until one of its templates changes,
+        and served with an ETag, so unchanged catalogues cost a 304.
+        """
+        if not request.user.patrol:
+            return super().list(request, *args, **kwargs)
+
+        version = get_catalogue_version(
+            request.user.patrol.team, request.build_absolute_uri("/")
         )
+        etag = quote_etag(version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(
+                get_cached_catalogue(
+                    version,
+                    lambda: (
+                        self.get_serializer(
+                            self.filter_queryset(self.get_queryset()), many=True
+                        ).data
+                    ),
+                )
+            )
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     def perform_create(self, serializer):
         if (
@@ -383,6 +748,104 @@ class TemplateWorksheetViewSet(MultipartNestedSupportMixin, ModelViewSet):
             raise PermissionDenied("You can't update this template to team scope")
         serializer.save()
 
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[
+            IsAuthenticated,
+            IsAllowedToInstantiateTemplateWorksheet,
+            TokenHasRequiredScope,
+        ],
+    )
+    def instantiate(self, request, id):
+        """
+        Create a worksheet from this template in a single request.
+
+        Takes `{"user_id": ..., "task_ids": [...]}`, where `task_ids` are the chosen
+        tasks of the template's task groups, within each group's minimum and
+        maximum. Tasks outside any group are always included. `user_id` defaults
+        to the current user.
+        """
+        template = get_object_or_404(self.get_queryset(), id=id)
+        self.check_object_permissions(request, template)
+        serializer = TemplateInstantiateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data.get("user_id", request.user)
+
+        try:
+            worksheet = instantiate_template(
+                template, user, serializer.validated_data["task_ids"]
+            )
+        except ValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+
+        if user != request.user:
+            send_notification(
+                targets=user,
+                title=f'Próba "{worksheet.name}" została utworzona dla Ciebie',
+                body=f'Próba "{worksheet.name}" została utworzona przez {request.user.full_name_nickname()}',
+                link=f"worksheets#{worksheet.id}",
+            )
+        return Response(
+            WorksheetSerializer(worksheet, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[
+            IsAuthenticated,
+            IsAllowedToInstantiateTemplateWorksheet,
+            TokenHasRequiredScope,
+        ],
+    )
+    def assign(self, request, id):
+        """
+        Create worksheets from this template for many users at once.
+
+        Takes exactly one of `patrol_id`, `team_id` or `user_ids` (active members
+        of the current user's team), plus `task_ids` chosen as in `instantiate`.
+        Users who already have an active worksheet from the template are
+        skipped. Everyone who got a worksheet is notified in one batch.
+        """
+        template = get_object_or_404(self.get_queryset(), id=id)
+        self.check_object_permissions(request, template)
+        serializer = TemplateAssignSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            worksheets, skipped = assign_template(
+                template,
+                serializer.validated_data["users"],
+                serializer.validated_data["task_ids"],
+            )
+        except ValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+
+        targets = [
+            worksheet.user for worksheet in worksheets if worksheet.user != request.user
+        ]
+        if targets:
+            send_notification(
+                targets=targets,
+                title=f'Próba "{template.name}" została utworzona dla Ciebie',
+                body=f'Próba "{template.name}" została utworzona przez {request.user.full_name_nickname()}',
+                link="worksheets",
+            )
+        return Response(
+            {
+                "created": [
+                    {"id": worksheet.id, "user_id": worksheet.user_id}
+                    for worksheet in worksheets
+                ],
+                "skipped_user_ids": [user.id for user in skipped],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(
         detail=True,
         methods=["get"],
@@ -410,7 +873,15 @@ class TaskViewSet(viewsets.ModelViewSet):
     required_scopes = ["worksheets"]
 
     def get_queryset(self):
-        return Task.objects.filter(worksheet__id=self.kwargs.get("worksheet_id"))
+        # Permission checks only need the worksheet owner and their patrol
+        queryset = Task.objects.filter(
+            worksheet__id=self.kwargs.get("worksheet_id")
+        ).select_related("worksheet__user__patrol")
+        if self.action == "get_approvers":
+            queryset = queryset.select_related(
+                "worksheet__user__patrol", "worksheet__supervisor__patrol__team"
+            )
+        return queryset
 
     def get_permissions(self):
         """Set permissions based on action"""
@@ -442,8 +913,6 @@ class TaskViewSet(viewsets.ModelViewSet):
             serializer.instance.approval_date = timezone.now()
             serializer.instance.approver = self.request.user
         serializer.save()
-        serializer.instance.worksheet.save()
-        clear_tokens()
 
     @action(detail=True, methods=["post"])
     def submit(self, request, *args, **kwargs):
@@ -494,7 +963,6 @@ class TaskViewSet(viewsets.ModelViewSet):
         task.approver = request.user
         task.approval_date = timezone.now()
         task.save()
-        task.worksheet.save()  # Update worksheet timestamp
 
         if old_status != 2 and request.user != task.worksheet.user:
             send_notification(
@@ -515,7 +983,6 @@ class TaskViewSet(viewsets.ModelViewSet):
         task.approval_date = timezone.now()
         task.approver = request.user
         task.save()
-        task.worksheet.save()  # Update worksheet timestamp
 
         if old_status not in [0, 3] and request.user != task.worksheet.user:
             send_notification(
@@ -578,29 +1045,26 @@ class TaskViewSet(viewsets.ModelViewSet):
                 "Task already submitted or approved, so you don't need that information"
             )
 
+        owner = task.worksheet.user
+        supervisor = task.worksheet.supervisor
+        # Patrol leaders may only approve general tasks
+        min_function = 2 if task.category == "general" else 3
+
         available_approvers = []
+        if owner.patrol_id:
+            available_approvers = [
+                approver
+                for approver in get_team_approvers(owner.patrol.team_id)
+                if approver["function"] >= min_function
+                and approver["id"] != str(owner.id)
+            ]
 
         if (
-            task.worksheet.supervisor
-            and task.worksheet.supervisor != task.worksheet.user
-        ):
-            available_approvers.append(task.worksheet.supervisor)
-
-        if task.worksheet.user.patrol:
-            available_approvers.extend(
-                User.objects.filter(
-                    patrol__team=task.worksheet.user.patrol.team,
-                    function__gte=3,
-                ).exclude(id=task.worksheet.user.id)
+            supervisor
+            and supervisor.id != owner.id
+            and all(
+                approver["id"] != str(supervisor.id) for approver in available_approvers
             )
-
-            if task.category == "general":
-                available_approvers.extend(
-                    User.objects.filter(
-                        patrol__team=task.worksheet.user.patrol.team,
-                        function__gte=2,
-                    ).exclude(id=task.worksheet.user.id)
-                )
-
-        available_approvers = list(set(available_approvers))
-        return Response(PublicUserSerializer(available_approvers, many=True).data)
+        ):
+            available_approvers.insert(0, PublicUserSerializer(supervisor).data)
+        return Response(available_approvers)
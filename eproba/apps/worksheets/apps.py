@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WorksheetConfig(AppConfig):
     name = "apps.worksheets"
     verbose_name = "Próby"
+
+    def ready(self):
+        from . import signals  # noqa: F401
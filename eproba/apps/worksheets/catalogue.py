@@ -0,0 +1,85 @@
+import hashlib
+import uuid
+
+from django.core.cache import caches
+
+from apps.core.utils import CollectingCallback, on_commit_collect
+
+from .models import TemplateWorksheet
+
+CATALOGUE_CACHE_ALIAS = "shared"
+
+
+def get_template_scope(team_id, organization):
+    """Catalogue a template with this team and organization is listed in."""
+    if team_id is not None:
+        return ("team", str(team_id))
+    if organization is not None:
+        return ("organization", str(organization))
+    return None
+
+
+def _get_version_key(scope):
+    return "catalogue-version:{}:{}".format(*scope)
+
+
+def get_catalogue_version(team, base_url):
+    """
+    Identify the template catalogue visible to members of `team`.
+
+    Combines the versions of the team's and its organization's templates,
+    which change whenever one of their templates, tasks or groups does, and
+    the base URL the image links are built with.
+    """
+    catalogue_cache = caches[CATALOGUE_CACHE_ALIAS]
+    parts = [base_url]
+    for scope in (
+        get_template_scope(team.pk, None),
+        get_template_scope(None, team.organization),
+    ):
+        key = _get_version_key(scope)
+        parts += [key, catalogue_cache.get_or_set(key, uuid.uuid4().hex, None)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def get_cached_catalogue(version, build):
+    """Serialized catalogue of `version`, calling `build()` only on a cache miss."""
+    catalogue_cache = caches[CATALOGUE_CACHE_ALIAS]
+    key = f"catalogue:{version}"
+    data = catalogue_cache.get(key)
+    if data is None:
+        data = build()
+        catalogue_cache.set(key, data)
+    return data
+
+
+class _CatalogueInvalidation(CollectingCallback):
+    """
+    on_commit callback moving the affected catalogues to a new version.
+
+    Items are scopes, or ("template", id) for changes of template tasks and
+    groups, resolved to the scope of their template with one query.
+    """
+
+    def run(self):
+        scopes = {item for item in self.items if item[0] != "template"}
+        template_ids = [value for kind, value in self.items if kind == "template"]
+        if template_ids:
+            for team_id, organization in (
+                TemplateWorksheet.objects.using(self.using)
+                .filter(id__in=template_ids)
+                .values_list("team_id", "organization")
+            ):
+                scopes.add(get_template_scope(team_id, organization))
+        scopes.discard(None)
+        if scopes:
+            caches[CATALOGUE_CACHE_ALIAS].set_many(
+                {_get_version_key(scope): uuid.uuid4().hex for scope in scopes}, None
+            )
+
+
+def invalidate_template_catalogue(scopes=(), template_ids=(), using=None):
+    """Drop the cached catalogues listing the given scopes or templates on commit."""
+    items = {scope for scope in scopes if scope is not None}
+    items.update(("template", str(template_id)) for template_id in template_ids)
+    on_commit_collect(_CatalogueInvalidation, items, using=using)
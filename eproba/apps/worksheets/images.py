@@ -0,0 +1,103 @@
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Longest side of each variant, images are never scaled up
+IMAGE_VARIANT_SIZES = {
+    "thumbnail": 320,
+    "medium": 960,
+}
+IMAGE_VARIANTS_DIR = "template_images/variants"
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Vector images scale by themselves and GIFs would lose their animation
+RASTER_EXTENSIONS = {"jpg", "jpeg", "png"}
+
+
+def has_image_variants(name):
+    return name.rsplit(".", 1)[-1].lower() in RASTER_EXTENSIONS
+
+
+def _encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def _save_variant(directory, variant, content, extension):
+    # Content-hashed names never change meaning, so they can be cached forever
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    name = posixpath.join(directory, f"{variant}.{digest}.{extension}")
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    return name
+
+
+def generate_image_variants(image_field):
+    """
+    Write resized WebP and JPEG/PNG copies of an uploaded template image.
+
+    Returns the description stored in TemplateWorksheet.image_variants: the
+    name of the source image and, for every variant, its size and file names.
+    """
+    name = image_field.name
+    variants = {"source": name}
+    if not has_image_variants(name):
+        return variants
+
+    directory = posixpath.join(
+        IMAGE_VARIANTS_DIR, posixpath.splitext(posixpath.basename(name))[0]
+    )
+    with image_field.open("rb") as file, Image.open(file) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ("RGBA", "LA") or "transparency" in original.info
+        original = original.convert("RGBA" if has_alpha else "RGB")
+
+        for variant, size in IMAGE_VARIANT_SIZES.items():
+            image = original.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            if has_alpha:
+                fallback = ("png", _encode(image, "PNG", optimize=True))
+            else:
+                fallback = (
+                    "jpg",
+                    _encode(
+                        image,
+                        "JPEG",
+                        quality=JPEG_QUALITY,
+                        optimize=True,
+                        progressive=True,
+                    ),
+                )
+            variants[variant] = {
+                "width": image.width,
+                "height": image.height,
+                "webp": _save_variant(
+                    directory,
+                    variant,
+                    _encode(image, "WEBP", quality=WEBP_QUALITY, method=6),
+                    "webp",
+                ),
+                "fallback": _save_variant(directory, variant, fallback[1], fallback[0]),
+            }
+    return variants
+
+
+def get_variant_files(variants):
+    return {
+        name
+        for variant in IMAGE_VARIANT_SIZES
+        if variant in variants
+        for name in (variants[variant]["webp"], variants[variant]["fallback"])
+    }
+
+
+def delete_image_variants(variants, keep=()):
+    """Delete the variant files described by `variants`, except those in `keep`."""
+    for name in get_variant_files(variants) - set(keep):
+        default_storage.delete(name)
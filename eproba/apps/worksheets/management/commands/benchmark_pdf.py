@@ -0,0 +1,66 @@
+from statistics import mean, median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.worksheets.models import Worksheet
+from apps.worksheets.pdf import (
+    can_render_pdf,
+    get_printable_queryset,
+    get_stylesheet_source,
+    render_pdf_html,
+    write_pdf,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-render PDF latency of a fresh WeasyPrint setup (as used before "
+        "the warm renderer) against the reused per-worker renderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worksheet", help="Worksheet id, defaults to any")
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument(
+            "--base-url",
+            default="http://localhost:8000/",
+            help="Base URL the cold renderer fetches media and static files from",
+        )
+
+    def handle(self, *args, **options):
+        if not can_render_pdf():
+            raise CommandError("WeasyPrint is not available.")
+
+        worksheets = get_printable_queryset(Worksheet).filter(deleted=False)
+        if options["worksheet"]:
+            worksheets = worksheets.filter(id=options["worksheet"])
+        worksheet = worksheets.first()
+        if worksheet is None:
+            raise CommandError("No worksheet to render.")
+
+        from weasyprint import HTML
+
+        html = render_pdf_html(worksheet)
+        # The template used to embed its stylesheet and was rendered from scratch
+        inline_html = f"<style>{get_stylesheet_source()}</style>{html}"
+        base_url = options["base_url"]
+
+        def cold():
+            HTML(string=inline_html, base_url=base_url).write_pdf()
+
+        def warm():
+            write_pdf(html, base_url)
+
+        warm()  # First render builds the renderer, as the first request of a worker
+        for name, render in [("cold", cold), ("warm", warm)]:
+            timings = []
+            for _ in range(options["runs"]):
+                start = perf_counter()
+                render()
+                timings.append((perf_counter() - start) * 1000)
+            self.stdout.write(
+                f"{name}: mean {mean(timings):.1f} ms, median {median(timings):.1f} ms, "
+                f"min {min(timings):.1f} ms, max {max(timings):.1f} ms "
+                f"({options['runs']} runs)"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.worksheets.models import TemplateWorksheet
+from apps.worksheets.tasks import generate_template_image_variants
+
+
+class Command(BaseCommand):
+    help = "Generate the resized variants of template images that lack them."
+
+    def handle(self, *args, **options):
+        generated = 0
+        templates = (
+            TemplateWorksheet.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .only("id", "image", "image_variants")
+        )
+        for template in templates.iterator():
+            if template.image_variants.get("source") != template.image.name:
+                generate_template_image_variants.call(str(template.pk))
+                generated += 1
+        self.stdout.write(f"Generated image variants of {generated} templates.")
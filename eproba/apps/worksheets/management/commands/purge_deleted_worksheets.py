@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.worksheets.tasks import PURGE_BATCH_SIZE, remove_expired_deleted_worksheets
+
+
+class Command(BaseCommand):
+    help = "Permanently remove worksheets soft-deleted more than 30 days ago."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        removed = remove_expired_deleted_worksheets(batch_size=options["batch_size"])
+        self.stdout.write(
+            f"Removed {removed['worksheets']} worksheets, {removed['tasks']} tasks "
+            f"and {removed['tombstones']} expired sync tombstones."
+        )
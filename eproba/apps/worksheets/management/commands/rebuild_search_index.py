@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.worksheets.models import SearchDocument, TemplateWorksheet, Worksheet
+from apps.worksheets.search import reindex
+from apps.worksheets.utils import iter_id_batches
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index of every worksheet and template."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Searches keep using the old index until the new one is committed
+        with transaction.atomic():
+            SearchDocument.objects.all().delete()
+            for model, argument in (
+                (Worksheet, "worksheet_ids"),
+                (TemplateWorksheet, "template_ids"),
+            ):
+                total = 0
+                for batch in iter_id_batches(
+                    model.objects.all(), options["batch_size"]
+                ):
+                    reindex(**{argument: batch})
+                    total += len(batch)
+                self.stdout.write(
+                    f"Indexed {total} {model._meta.verbose_name_plural.lower()}."
+                )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.worksheets.models import Worksheet, update_task_counts
+from apps.worksheets.utils import iter_id_batches
+
+
+class Command(BaseCommand):
+    help = "Recompute the task counters of every worksheet from its tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = 0
+        for batch in iter_id_batches(Worksheet.objects.all(), options["batch_size"]):
+            update_task_counts(batch)
+            total += len(batch)
+        self.stdout.write(f"Recounted tasks of {total} worksheets.")
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.7 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0012_alter_task_task_alter_templatetask_task"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("worksheet", "Próba"), ("task", "Zadanie")],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.UUIDField(verbose_name="Usunięty obiekt")),
+                ("worksheet_id", models.UUIDField(verbose_name="Próba")),
+                (
+                    "owner_id",
+                    models.UUIDField(blank=True, null=True, verbose_name="Właściciel"),
+                ),
+                (
+                    "supervisor_id",
+                    models.UUIDField(blank=True, null=True, verbose_name="Opiekun"),
+                ),
+                (
+                    "team_id",
+                    models.UUIDField(blank=True, null=True, verbose_name="Drużyna"),
+                ),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="Data usunięcia"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Usunięty obiekt",
+                "verbose_name_plural": "Usunięte obiekty",
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0013_tombstone"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="worksheet",
+            index=models.Index(
+                condition=models.Q(("deleted", True)),
+                fields=["updated_at"],
+                name="worksheet_deleted_updated_idx",
+            ),
+        ),
+    ]
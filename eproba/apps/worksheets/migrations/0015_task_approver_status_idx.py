@@ -0,0 +1,20 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0014_worksheet_deleted_updated_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["approver", "status"], name="task_approver_status_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0015_task_approver_status_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["worksheet", "status"], name="task_worksheet_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["status", "approval_date"], name="task_status_approval_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="worksheet",
+            index=models.Index(
+                fields=["user", "is_archived", "deleted"],
+                name="worksheet_user_state_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="worksheet",
+            index=models.Index(
+                fields=["updated_at", "id"], name="worksheet_updated_idx"
+            ),
+        ),
+    ]
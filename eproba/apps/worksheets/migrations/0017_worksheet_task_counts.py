@@ -0,0 +1,67 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_tasks(apps, schema_editor):
+    Worksheet = apps.get_model("worksheets", "Worksheet")
+    Task = apps.get_model("worksheets", "Task")
+
+    def count(**filters):
+        return Coalesce(
+            Subquery(
+                Task.objects.filter(worksheet=OuterRef("pk"), **filters)
+                .order_by()
+                .values("worksheet")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+
+    Worksheet.objects.using(schema_editor.connection.alias).update(
+        task_count=count(),
+        completed_task_count=count(status=2),
+        pending_task_count=count(status=1),
+        rejected_task_count=count(status=3),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0016_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="worksheet",
+            name="completed_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Liczba zatwierdzonych zadań"
+            ),
+        ),
+        migrations.AddField(
+            model_name="worksheet",
+            name="pending_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Liczba zadań do zatwierdzenia"
+            ),
+        ),
+        migrations.AddField(
+            model_name="worksheet",
+            name="rejected_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Liczba odrzuconych zadań"
+            ),
+        ),
+        migrations.AddField(
+            model_name="worksheet",
+            name="task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Liczba zadań"
+            ),
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0017_worksheet_task_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="templateworksheet",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="Warianty obrazka",
+            ),
+        ),
+    ]
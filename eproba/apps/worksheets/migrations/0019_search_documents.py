@@ -0,0 +1,171 @@
+# Generated by Django 6.0.7 on 2026-10-18 19:25
+
+import unicodedata
+
+from django.db import migrations, models
+
+FTS_TABLE = "worksheets_searchdocument_fts"
+
+SQLITE_INDEX = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body, content='worksheets_searchdocument', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER worksheets_searchdocument_ai
+    AFTER INSERT ON worksheets_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER worksheets_searchdocument_ad
+    AFTER DELETE ON worksheets_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER worksheets_searchdocument_au
+    AFTER UPDATE ON worksheets_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_DROP_INDEX = [
+    "DROP TRIGGER worksheets_searchdocument_ai",
+    "DROP TRIGGER worksheets_searchdocument_ad",
+    "DROP TRIGGER worksheets_searchdocument_au",
+    f"DROP TABLE {FTS_TABLE}",
+]
+
+# Text is folded before it is stored, so the "simple" configuration is enough
+# and the unaccent extension is not needed
+POSTGRES_INDEX = [
+    """
+    ALTER TABLE worksheets_searchdocument ADD COLUMN document tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A')
+        || setweight(to_tsvector('simple', body), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX searchdocument_document_idx
+    ON worksheets_searchdocument USING GIN (document)
+    """,
+]
+POSTGRES_DROP_INDEX = [
+    "DROP INDEX searchdocument_document_idx",
+    "ALTER TABLE worksheets_searchdocument DROP COLUMN document",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+def fold(text):
+    """Lowercase `text` and strip its diacritics, as search.fold() did here."""
+    # "ł" has no Unicode decomposition, so NFKD does not strip its stroke
+    decomposed = unicodedata.normalize(
+        "NFKD", text.translate(str.maketrans({"ł": "l", "Ł": "L"}))
+    )
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def index_existing(apps, schema_editor):
+    SearchDocument = apps.get_model("worksheets", "SearchDocument")
+    using = schema_editor.connection.alias
+    sources = [
+        ("worksheet", apps.get_model("worksheets", "Worksheet"), "id", "name"),
+        ("task", apps.get_model("worksheets", "Task"), "worksheet_id", "task"),
+        ("template", apps.get_model("worksheets", "TemplateWorksheet"), "id", "name"),
+        (
+            "template_task",
+            apps.get_model("worksheets", "TemplateTask"),
+            "template_id",
+            "task",
+        ),
+    ]
+    for kind, model, parent_field, title_field in sources:
+        rows = model.objects.using(using).values_list(
+            "id", parent_field, title_field, "description"
+        )
+        SearchDocument.objects.using(using).bulk_create(
+            (
+                SearchDocument(
+                    kind=kind,
+                    object_id=object_id,
+                    parent_id=parent_id,
+                    title=fold(title),
+                    body=fold(description),
+                )
+                for object_id, parent_id, title, description in rows.iterator()
+                if title
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksheets", "0018_templateworksheet_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("worksheet", "Próba"),
+                            ("task", "Zadanie"),
+                            ("template", "Szablon"),
+                            ("template_task", "Zadanie szablonu"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.UUIDField(verbose_name="Obiekt")),
+                ("parent_id", models.UUIDField(verbose_name="Próba lub szablon")),
+                ("title", models.TextField(verbose_name="Tytuł")),
+                (
+                    "body",
+                    models.TextField(blank=True, default="", verbose_name="Treść"),
+                ),
+            ],
+            options={
+                "verbose_name": "Dokument wyszukiwania",
+                "verbose_name_plural": "Dokumenty wyszukiwania",
+                "indexes": [
+                    models.Index(fields=["parent_id"], name="searchdocument_parent_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX}),
+            run_for_vendor(
+                {"sqlite": SQLITE_DROP_INDEX, "postgresql": POSTGRES_DROP_INDEX}
+            ),
+        ),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,15 @@
 import os
 import uuid
+from contextlib import nullcontext
 
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import UUIDField
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, UUIDField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from apps.core.models import TrackedFieldsMixin
+from apps.core.utils import CollectingCallback, on_commit_collect
 from apps.teams.models import OrganizationChoice, Team
 from apps.users.models import User
 
@@ -39,7 +43,7 @@ def validate_template_image(file):
         raise ValidationError("File size exceeds the limit of 5MB.")
 
 
-class Worksheet(models.Model):
+class Worksheet(TrackedFieldsMixin, models.Model):
     id = UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(
         User,
@@ -94,15 +98,102 @@ class Worksheet(models.Model):
         verbose_name="Opis próby końcowej (biegu)",
     )
 
+    # Maintained by update_task_counts() whenever tasks are added, removed or
+    # change status; repair with the recount_worksheet_tasks command.
+    task_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Liczba zadań"
+    )
+    completed_task_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Liczba zatwierdzonych zadań"
+    )
+    pending_task_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Liczba zadań do zatwierdzenia"
+    )
+    rejected_task_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Liczba odrzuconych zadań"
+    )
+
+    # Who can see the worksheet, see sync.record_visibility_loss(), and the
+    # text indexed for search
+    tracked_fields = ("user_id", "supervisor_id", "name", "description")
+
     def __str__(self):
         return f"{self.name} - {self.user.rank_nickname}"
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # Counters of an existing worksheet are written only by
+        # update_task_counts(), so saving an instance loaded before its tasks
+        # changed cannot overwrite them with stale values.
+        if not self._state.adding:
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            update_fields = [
+                name for name in update_fields if name not in TASK_COUNT_FIELDS
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    @property
+    def completion_rate(self):
+        """Percentage of approved tasks, None for a worksheet without tasks."""
+        if not self.task_count:
+            return None
+        return self.completed_task_count / self.task_count * 100
+
     class Meta:
         verbose_name = "Próba"
         verbose_name_plural = "Próby"
-
-
-class Task(models.Model):
+        indexes = [
+            # Worksheet lists of a user, split by archived and deleted
+            models.Index(
+                fields=["user", "is_archived", "deleted"],
+                name="worksheet_user_state_idx",
+            ),
+            # Delta sync and keyset pagination on (-updated_at, -id)
+            models.Index(fields=["updated_at", "id"], name="worksheet_updated_idx"),
+            # Used by remove_expired_deleted_worksheets
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(deleted=True),
+                name="worksheet_deleted_updated_idx",
+            ),
+        ]
+
+
+class _WorksheetTouch(CollectingCallback):
+    """on_commit callback bumping updated_at of every worksheet collected so far."""
+
+    def run(self):
+        Worksheet.objects.using(self.using).filter(id__in=self.items).update(
+            updated_at=timezone.now()
+        )
+
+
+def touch_worksheets(worksheet_ids, using=None):
+    """
+    Bump `updated_at` of the given worksheets with a single UPDATE.
+
+    Inside a transaction the ids are collected and written once on commit, so
+    saving many tasks of the same worksheets does not rewrite them every time.
+    """
+    on_commit_collect(_WorksheetTouch, worksheet_ids, using=using)
+
+
+class TaskQuerySet(models.QuerySet):
+    def delete(self):
+        # Bulk deletes skip Task.delete(), recount their worksheets here instead
+        worksheet_ids = set(self.values_list("worksheet_id", flat=True))
+        with transaction.atomic(using=self.db):
+            result = super().delete()
+            update_task_counts(worksheet_ids, using=self.db)
+        return result
+
+
+class Task(TrackedFieldsMixin, models.Model):
     id = UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     worksheet = models.ForeignKey(
         Worksheet, related_name="tasks", on_delete=models.CASCADE
@@ -137,19 +228,117 @@ class Task(models.Model):
         default=0, verbose_name="Kolejność zadania w próbie/kategorii"
     )
 
+    objects = TaskQuerySet.as_manager()
+
+    tracked_fields = ("status", "approver_id", "worksheet_id", "task", "description")
+
     def __str__(self):
         return str(self.task)
 
     class Meta:
         verbose_name = "Zadanie"
         verbose_name_plural = "Zadania"
+        indexes = [
+            # Reviewer inbox: pending tasks waiting for a given approver
+            models.Index(
+                fields=["approver", "status"], name="task_approver_status_idx"
+            ),
+            # Progress of a worksheet (tasks by status)
+            models.Index(
+                fields=["worksheet", "status"], name="task_worksheet_status_idx"
+            ),
+            # Recently approved tasks in team statistics
+            models.Index(
+                fields=["status", "approval_date"], name="task_status_approval_idx"
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        super().save()
-        self.worksheet.save()  # update updated_at
+        using = kwargs.get("using")
+        changes = self.tracked_changes()
+        worksheet_ids = {
+            self.worksheet_id,
+            changes.get("worksheet_id", self.worksheet_id),
+        }
+        recount = self._state.adding or changes.keys() & {"status", "worksheet_id"}
+        # Counters are written in the same transaction as the task
+        with transaction.atomic(using=using) if recount else nullcontext():
+            super().save(*args, **kwargs)
+            if recount:
+                update_task_counts(worksheet_ids, using=using)
+        touch_worksheets(worksheet_ids, using=using)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get("using")
+        with transaction.atomic(using=using):
+            result = super().delete(*args, **kwargs)
+            update_task_counts([self.worksheet_id], using=using)
+        return result
+
+
+def _count_tasks(**filters):
+    return Coalesce(
+        Subquery(
+            Task.objects.filter(worksheet=OuterRef("pk"), **filters)
+            .order_by()
+            .values("worksheet")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+TASK_COUNT_FIELDS = (
+    "task_count",
+    "completed_task_count",
+    "pending_task_count",
+    "rejected_task_count",
+)
+
+
+def update_task_counts(worksheet_ids, using=None):
+    """
+    Recompute the task counters of the given worksheets with a single UPDATE.
+
+    Call it in the transaction that changed the tasks, so the counters never
+    disagree with the tasks they count.
+    """
+    Worksheet.objects.using(using).filter(id__in=worksheet_ids).update(
+        task_count=_count_tasks(),
+        completed_task_count=_count_tasks(status=2),
+        pending_task_count=_count_tasks(status=1),
+        rejected_task_count=_count_tasks(status=3),
+    )
+
+
+class Tombstone(models.Model):
+    """Trace of a hard-deleted worksheet or task, used by delta sync clients."""
+
+    KIND_CHOICES = (
+        ("worksheet", "Próba"),
+        ("task", "Zadanie"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.UUIDField(verbose_name="Usunięty obiekt")
+    worksheet_id = models.UUIDField(verbose_name="Próba")
+    owner_id = models.UUIDField(null=True, blank=True, verbose_name="Właściciel")
+    supervisor_id = models.UUIDField(null=True, blank=True, verbose_name="Opiekun")
+    team_id = models.UUIDField(null=True, blank=True, verbose_name="Drużyna")
+    deleted_at = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name="Data usunięcia"
+    )
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+    class Meta:
+        verbose_name = "Usunięty obiekt"
+        verbose_name_plural = "Usunięte obiekty"
 
 
-class TemplateWorksheet(models.Model):
+class TemplateWorksheet(TrackedFieldsMixin, models.Model):
     id = UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     team = models.ForeignKey(
         Team, related_name="templates", on_delete=models.CASCADE, null=True, blank=True
@@ -170,6 +359,10 @@ class TemplateWorksheet(models.Model):
         verbose_name="Obrazek szablonu",
         help_text="Obsługiwane formaty: JPG, PNG, SVG oraz GIF. Maksymalny rozmiar: 5MB",
     )
+    # Resized copies of `image`, written by generate_template_image_variants
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Warianty obrazka"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     priority = models.IntegerField(
@@ -178,6 +371,9 @@ class TemplateWorksheet(models.Model):
         help_text="Szablony o wyższym priorytecie będą wyświetlane wyżej na liście.",
     )
 
+    # The catalogue a template is listed in follows from these
+    tracked_fields = ("team_id", "organization")
+
     def __str__(self):
         return self.name
 
@@ -283,3 +479,38 @@ class TemplateTask(models.Model):
             raise ValidationError(
                 "Zadanie musi należeć do tego samego szablonu co grupa zadań."
             )
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of a worksheet, a template or one of their tasks.
+
+    Written by apps.worksheets.search with diacritics already folded. The
+    full-text index over `title` and `body` is created by the migration, as an
+    FTS5 table on SQLite and a GIN-indexed tsvector column on PostgreSQL.
+    """
+
+    KIND_CHOICES = (
+        ("worksheet", "Próba"),
+        ("task", "Zadanie"),
+        ("template", "Szablon"),
+        ("template_task", "Zadanie szablonu"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.UUIDField(verbose_name="Obiekt")
+    # Worksheet or template the object belongs to, or the object itself
+    parent_id = models.UUIDField(verbose_name="Próba lub szablon")
+    title = models.TextField(verbose_name="Tytuł")
+    body = models.TextField(blank=True, default="", verbose_name="Treść")
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+    class Meta:
+        verbose_name = "Dokument wyszukiwania"
+        verbose_name_plural = "Dokumenty wyszukiwania"
+        indexes = [
+            # Documents are rewritten per worksheet or template
+            models.Index(fields=["parent_id"], name="searchdocument_parent_idx"),
+        ]
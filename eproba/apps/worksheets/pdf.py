@@ -0,0 +1,314 @@
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import cache
+from operator import attrgetter
+from zipfile import ZIP_STORED, ZipFile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from unidecode import unidecode
+
+from .models import Task, TemplateWorksheet, Worksheet
+from .tasks import render_pdf_job
+
+try:
+    from .renderer import get_renderer
+except (OSError, ImportError):
+    get_renderer = None
+
+PDF_TEMPLATE = "worksheets/worksheet_pdf.html"
+PDF_STYLESHEET = "worksheets/worksheet_pdf.css"
+PDF_CACHE_ALIAS = "pdf"
+PDF_JOB_TIMEOUT = 60 * 60
+
+_export_executor = None
+_export_executor_lock = threading.Lock()
+
+
+@cache
+def get_stylesheet_source():
+    return get_template(PDF_STYLESHEET).template.source
+
+
+@cache
+def get_layout_version():
+    """Hash of the PDF template and stylesheet, so layout changes invalidate cached PDFs."""
+    source = get_template(PDF_TEMPLATE).template.source + get_stylesheet_source()
+    return hashlib.sha256(source.encode()).hexdigest()[:12]
+
+
+def get_pdf_version(obj):
+    """
+    Identify the rendered PDF of a worksheet or template worksheet.
+
+    Task changes bump the worksheet's `updated_at`, so the id, that timestamp and
+    the layout version (plus the linked template for its image) cover everything
+    the PDF shows.
+    """
+    parts = [obj._meta.label, obj.pk, obj.updated_at.isoformat(), get_layout_version()]
+    template = getattr(obj, "template", None)
+    if template is not None:
+        parts += [template.pk, template.updated_at.isoformat()]
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def get_printable_queryset(model):
+    """Queryset loading everything the PDF template shows, in a fixed number of queries."""
+    if model is TemplateWorksheet:
+        return TemplateWorksheet.objects.prefetch_related("tasks")
+    return Worksheet.objects.select_related(
+        "user__patrol__team", "supervisor", "template"
+    ).prefetch_related(
+        Prefetch("tasks", queryset=Task.objects.select_related("approver"))
+    )
+
+
+def get_pdf_context(obj, *, is_template=False):
+    all_tasks = sorted(obj.tasks.all(), key=attrgetter("order"))
+    general_tasks = [task for task in all_tasks if task.category == "general"]
+    individual_tasks = [task for task in all_tasks if task.category == "individual"]
+    return {
+        "worksheet": obj,
+        "is_template": is_template,
+        "all_tasks": all_tasks,
+        "general_tasks": general_tasks,
+        "individual_tasks": individual_tasks,
+        "has_both_categories": bool(general_tasks) and bool(individual_tasks),
+    }
+
+
+def render_pdf_html(obj, *, is_template=False):
+    return render_to_string(PDF_TEMPLATE, get_pdf_context(obj, is_template=is_template))
+
+
+def write_pdf(html, base_url):
+    """Run WeasyPrint on already rendered HTML; touches neither the database nor caches."""
+    return get_renderer(get_stylesheet_source()).write_pdf(html, base_url)
+
+
+def render_pdf(obj, base_url, *, is_template=False):
+    return write_pdf(render_pdf_html(obj, is_template=is_template), base_url)
+
+
+def get_pdf_filename(obj):
+    return f"{unidecode(str(obj))} - Epróba.pdf"
+
+
+def render_pdf_into_cache(obj, base_url, *, is_template=False):
+    pdf = render_pdf(obj, base_url, is_template=is_template)
+    caches[PDF_CACHE_ALIAS].set(get_pdf_version(obj), pdf)
+    return pdf
+
+
+def can_render_pdf():
+    return get_renderer is not None
+
+
+def pdf_unavailable_response():
+    return HttpResponse(
+        "Weasyprint is not installed, PDF generation is not possible.\nContact the administrator for help.",
+        content_type="text/plain",
+        status=500,
+    )
+
+
+def pdf_response(request, obj, *, is_template=False):
+    """
+    Serve the PDF of `obj`, rendering it only when no cached copy exists.
+
+    Responses carry an ETag and Last-Modified, so clients revalidating an
+    unchanged PDF get a 304 without the PDF being read or rendered.
+    """
+    version = get_pdf_version(obj)
+    etag = quote_etag(version)
+    last_modified = int(obj.updated_at.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        pdf_cache = caches[PDF_CACHE_ALIAS]
+        pdf = pdf_cache.get(version)
+        if pdf is None:
+            if not can_render_pdf():
+                return pdf_unavailable_response()
+            try:
+                pdf = render_pdf_into_cache(
+                    obj, request.build_absolute_uri(), is_template=is_template
+                )
+            except Exception as e:
+                return HttpResponse(
+                    f"Error generating PDF: {e!s}",
+                    content_type="text/plain",
+                    status=500,
+                )
+
+        response = HttpResponse(pdf, content_type="application/pdf")
+        response["Content-Disposition"] = f'inline; filename="{get_pdf_filename(obj)}"'
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # Always revalidate, the PDF changes together with the worksheet
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _get_job_key(job_id):
+    return f"job:{job_id}"
+
+
+def start_pdf_job(request, obj, *, is_template=False):
+    """
+    Queue rendering of the PDF of `obj` in the background and return the job id.
+
+    Jobs are identified by the PDF version, so repeated requests for an unchanged
+    worksheet share one job and a cached PDF makes the job ready right away.
+    """
+    job_id = get_pdf_version(obj)
+    job_key = _get_job_key(job_id)
+    pdf_url = request.build_absolute_uri(request.path)
+    pdf_cache = caches[PDF_CACHE_ALIAS]
+
+    if pdf_cache.has_key(job_id):
+        pdf_cache.set(job_key, {"status": "ready", "pdf_url": pdf_url}, PDF_JOB_TIMEOUT)
+        return job_id
+
+    job = pdf_cache.get(job_key)
+    if job is None or job["status"] == "failed":
+        pdf_cache.set(
+            job_key, {"status": "pending", "pdf_url": pdf_url}, PDF_JOB_TIMEOUT
+        )
+        render_pdf_job.enqueue(
+            obj._meta.label, str(obj.pk), job_id, pdf_url, is_template
+        )
+    return job_id
+
+
+def finish_pdf_job(job_id, error=None):
+    job_key = _get_job_key(job_id)
+    pdf_cache = caches[PDF_CACHE_ALIAS]
+    job = pdf_cache.get(job_key) or {"pdf_url": None}
+    if error is None:
+        job.update(status="ready")
+    else:
+        job.update(status="failed", detail=error)
+    pdf_cache.set(job_key, job, PDF_JOB_TIMEOUT)
+
+
+def get_pdf_job(job_id):
+    return caches[PDF_CACHE_ALIAS].get(_get_job_key(job_id))
+
+
+class _ZipChunks:
+    """Write-only file object handing what ZipFile wrote so far to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def get_export_executor():
+    """
+    Thread pool of PDF_EXPORT_WORKERS threads shared by every export.
+
+    Its threads keep their warm renderers between exports, and concurrent
+    exports queue for them instead of starting more threads.
+    """
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(
+                max_workers=settings.PDF_EXPORT_WORKERS,
+                thread_name_prefix="pdf-export",
+            )
+    return _export_executor
+
+
+def iter_worksheet_pdfs(worksheets, base_url):
+    """
+    Yield (worksheet, pdf or None, error) for every worksheet, cached ones first.
+
+    Missing PDFs are rendered in the shared export thread pool with at most
+    PDF_EXPORT_WORKERS renders of this export in flight. HTML is rendered up
+    front in this thread, so worker threads never touch the database.
+    """
+    pdf_cache = caches[PDF_CACHE_ALIAS]
+    max_workers = settings.PDF_EXPORT_WORKERS
+
+    def collect(futures):
+        for future in futures:
+            worksheet, version = in_flight.pop(future)
+            try:
+                pdf = future.result()
+            except Exception as e:
+                yield worksheet, None, f"Error generating PDF: {e!s}"
+            else:
+                pdf_cache.set(version, pdf)
+                yield worksheet, pdf, None
+
+    executor = get_export_executor()
+    in_flight = {}
+    try:
+        for worksheet in worksheets:
+            version = get_pdf_version(worksheet)
+            pdf = pdf_cache.get(version)
+            if pdf is not None:
+                yield worksheet, pdf, None
+                continue
+
+            if len(in_flight) >= max_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+            future = executor.submit(write_pdf, render_pdf_html(worksheet), base_url)
+            in_flight[future] = (worksheet, version)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        # An abandoned download must not keep the shared threads busy
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_pdf_zip(worksheets, base_url):
+    """Stream a ZIP of worksheet PDFs, emitting each entry as soon as it is ready."""
+    buffer = _ZipChunks()
+    # PDFs are compressed already, deflating them again is not worth the CPU
+    with ZipFile(buffer, mode="w", compression=ZIP_STORED) as archive:
+        for worksheet, pdf, error in iter_worksheet_pdfs(worksheets, base_url):
+            name = f"{unidecode(str(worksheet))} ({str(worksheet.id)[:8]})"
+            if pdf is None:
+                archive.writestr(f"{name} - błąd.txt", error)
+            else:
+                archive.writestr(f"{name}.pdf", pdf)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def pdf_zip_response(worksheets, base_url, filename):
+    response = StreamingHttpResponse(
+        iter_pdf_zip(worksheets, base_url), content_type="application/zip"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,73 @@
+import mimetypes
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.utils._os import safe_join
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+_local = threading.local()
+
+
+class LocalURLFetcher(URLFetcher):
+    """Read our own static and media files from disk instead of over HTTP."""
+
+    def fetch(self, url, headers=None):
+        path = self.get_local_path(url)
+        if path is None:
+            return super().fetch(url, headers)
+        mime_type, _ = mimetypes.guess_type(path)
+        return URLFetcherResponse(
+            url,
+            Path(path).read_bytes(),
+            {"Content-Type": mime_type or "application/octet-stream"},
+        )
+
+    @staticmethod
+    def get_local_path(url):
+        path = unquote(urlsplit(url).path)
+        if path.startswith(settings.MEDIA_URL):
+            return safe_join(settings.MEDIA_ROOT, path.removeprefix(settings.MEDIA_URL))
+        if path.startswith(settings.STATIC_URL):
+            relative_path = path.removeprefix(settings.STATIC_URL)
+            return finders.find(relative_path) or safe_join(
+                settings.STATIC_ROOT, relative_path
+            )
+        return None
+
+
+class PdfRenderer:
+    """
+    Long-lived WeasyPrint renderer.
+
+    Keeps the font configuration and the parsed stylesheet between renders, and
+    loads local assets from disk. WeasyPrint objects are not thread-safe, so
+    each thread gets its own renderer through get_renderer().
+    """
+
+    def __init__(self, stylesheet_source):
+        self.stylesheet_source = stylesheet_source
+        self.font_config = FontConfiguration()
+        self.url_fetcher = LocalURLFetcher()
+        self.stylesheet = CSS(
+            string=stylesheet_source,
+            font_config=self.font_config,
+            url_fetcher=self.url_fetcher,
+        )
+
+    def write_pdf(self, html, base_url):
+        return HTML(
+            string=html, base_url=base_url, url_fetcher=self.url_fetcher
+        ).write_pdf(stylesheets=[self.stylesheet], font_config=self.font_config)
+
+
+def get_renderer(stylesheet_source):
+    """Return the renderer of the current thread, creating it on first use."""
+    renderer = getattr(_local, "renderer", None)
+    if renderer is None or renderer.stylesheet_source != stylesheet_source:
+        renderer = _local.renderer = PdfRenderer(stylesheet_source)
+    return renderer
@@ -0,0 +1,202 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+
+from apps.core.utils import CollectingCallback, on_commit_collect
+
+from .models import SearchDocument, Task, TemplateTask, TemplateWorksheet, Worksheet
+
+SEARCH_FTS_TABLE = "worksheets_searchdocument_fts"
+# Matches taken from the index before grouping them by worksheet or template
+SEARCH_HIT_LIMIT = 200
+# Weights of the title and body columns in the ranking
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+WORKSHEET_KINDS = ("worksheet", "task")
+TEMPLATE_KINDS = ("template", "template_task")
+
+# "ł" has no Unicode decomposition, so NFKD does not strip its stroke
+_UNDECOMPOSED_LETTERS = str.maketrans({"ł": "l", "Ł": "L"})
+_TERM_RE = re.compile(r"[^\W_]+")
+
+
+def fold(text):
+    """Lowercase `text` and strip its diacritics, e.g. "Pływanie" -> "plywanie"."""
+    decomposed = unicodedata.normalize("NFKD", text.translate(_UNDECOMPOSED_LETTERS))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _document(kind, object_id, parent_id, title, body):
+    return SearchDocument(
+        kind=kind,
+        object_id=object_id,
+        parent_id=parent_id,
+        title=fold(title),
+        body=fold(body),
+    )
+
+
+def get_worksheet_documents(worksheet_ids, using=None):
+    """Search documents of the given worksheets and their tasks."""
+    worksheets = Worksheet.objects.using(using).filter(id__in=worksheet_ids)
+    tasks = Task.objects.using(using).filter(worksheet_id__in=worksheet_ids)
+    return [
+        _document("worksheet", id, id, name, description)
+        for id, name, description in worksheets.values_list("id", "name", "description")
+    ] + [
+        _document("task", id, worksheet_id, task, description)
+        for id, worksheet_id, task, description in tasks.values_list(
+            "id", "worksheet_id", "task", "description"
+        )
+    ]
+
+
+def get_template_documents(template_ids, using=None):
+    """Search documents of the given templates and their tasks."""
+    templates = TemplateWorksheet.objects.using(using).filter(id__in=template_ids)
+    tasks = TemplateTask.objects.using(using).filter(template_id__in=template_ids)
+    return [
+        _document("template", id, id, name, description)
+        for id, name, description in templates.values_list("id", "name", "description")
+    ] + [
+        _document("template_task", id, template_id, task, description)
+        for id, template_id, task, description in tasks.values_list(
+            "id", "template_id", "task", "description"
+        )
+        # Tasks without a name are only notes in the template
+        if task
+    ]
+
+
+def reindex(worksheet_ids=(), template_ids=(), using=None):
+    """Rewrite the search documents of the given worksheets and templates."""
+    documents = get_worksheet_documents(worksheet_ids, using) + get_template_documents(
+        template_ids, using
+    )
+    with transaction.atomic(using=using):
+        SearchDocument.objects.using(using).filter(
+            kind__in=WORKSHEET_KINDS, parent_id__in=worksheet_ids
+        ).delete()
+        SearchDocument.objects.using(using).filter(
+            kind__in=TEMPLATE_KINDS, parent_id__in=template_ids
+        ).delete()
+        SearchDocument.objects.using(using).bulk_create(documents, batch_size=500)
+
+
+class _SearchIndexRefresh(CollectingCallback):
+    """
+    on_commit callback reindexing every worksheet and template collected so far.
+
+    Items are ("worksheet", id) or ("template", id).
+    """
+
+    def run(self):
+        reindex(
+            worksheet_ids=[value for kind, value in self.items if kind == "worksheet"],
+            template_ids=[value for kind, value in self.items if kind == "template"],
+            using=self.using,
+        )
+
+
+def refresh_search_index(worksheet_ids=(), template_ids=(), using=None):
+    """Reindex the given worksheets and templates with their tasks on commit."""
+    items = {("worksheet", id) for id in worksheet_ids if id is not None}
+    items.update(("template", id) for id in template_ids if id is not None)
+    if items:
+        on_commit_collect(_SearchIndexRefresh, items, using=using)
+
+
+@dataclass
+class SearchResult:
+    """A worksheet or template matching a search, with its matching tasks."""
+
+    kind: str
+    id: object
+    rank: float
+    task_ids: list = field(default_factory=list)
+
+
+def _get_match_sql(vendor, terms):
+    """SQL of the documents matching all `terms` as prefixes, with their rank."""
+    table = SearchDocument._meta.db_table
+    if vendor == "sqlite":
+        # bm25() is lower for better matches
+        return (
+            f"SELECT d.kind, d.object_id, d.parent_id, "
+            f"-bm25({SEARCH_FTS_TABLE}, %s, %s) AS score "
+            f"FROM {SEARCH_FTS_TABLE} "
+            f"JOIN {table} d ON d.id = {SEARCH_FTS_TABLE}.rowid "
+            f"WHERE {SEARCH_FTS_TABLE} MATCH %s",
+            [TITLE_WEIGHT, BODY_WEIGHT, " ".join(f'"{term}"*' for term in terms)],
+        )
+    if vendor == "postgresql":
+        # ts_rank() weights are given for the D, C, B and A labels
+        return (
+            f"SELECT d.kind, d.object_id, d.parent_id, "
+            f"ts_rank(ARRAY[0, 0, %s, %s]::real[], d.document, query) AS score "
+            f"FROM {table} d, to_tsquery('simple', %s) query "
+            f"WHERE d.document @@ query",
+            [BODY_WEIGHT, TITLE_WEIGHT, " & ".join(f"{term}:*" for term in terms)],
+        )
+    raise NotImplementedError(f"Full-text search is not supported on {vendor}.")
+
+
+def _get_scope_sql(kinds, parents):
+    """SQL restricting documents of `kinds` to the parents in a queryset."""
+    try:
+        sql, params = parents.values("id").query.get_compiler(using=parents.db).as_sql()
+    except EmptyResultSet:
+        return None
+    return (
+        f"(d.kind IN ({', '.join(['%s'] * len(kinds))}) AND d.parent_id IN ({sql}))",
+        [*kinds, *params],
+    )
+
+
+def search(query, worksheets, templates, limit=20):
+    """
+    Find worksheets and templates whose text or task text matches `query`.
+
+    Every word of the query must match the beginning of a word, ignoring case
+    and diacritics. Only documents of the `worksheets` and `templates`
+    querysets are searched. Returns at most `limit` results, best first.
+    """
+    terms = _TERM_RE.findall(fold(query))
+    scopes = [
+        scope
+        for scope in (
+            _get_scope_sql(WORKSHEET_KINDS, worksheets),
+            _get_scope_sql(TEMPLATE_KINDS, templates),
+        )
+        if scope is not None
+    ]
+    if not terms or not scopes:
+        return []
+
+    connection = connections[worksheets.db]
+    sql, params = _get_match_sql(connection.vendor, terms)
+    sql += f" AND ({' OR '.join(scope_sql for scope_sql, _ in scopes)})"
+    for _, scope_params in scopes:
+        params += scope_params
+    sql += " ORDER BY score DESC LIMIT %s"
+    params.append(SEARCH_HIT_LIMIT)
+
+    uuid_field = SearchDocument._meta.get_field("object_id")
+    results = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for kind, object_id, parent_id, rank in cursor.fetchall():
+            object_id = uuid_field.to_python(object_id)
+            parent_id = uuid_field.to_python(parent_id)
+            parent_kind = "worksheet" if kind in WORKSHEET_KINDS else "template"
+            # Hits come best first, so a result keeps the rank of its best one
+            result = results.setdefault(
+                (parent_kind, parent_id), SearchResult(parent_kind, parent_id, rank)
+            )
+            if object_id != parent_id:
+                result.task_ids.append(object_id)
+    return list(results.values())[:limit]
@@ -0,0 +1,154 @@
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from apps.worksheets.models import (
+    Task,
+    TemplateWorksheet,
+    Worksheet,
+)
+from apps.worksheets.signals import tasks_bulk_created
+
+# Keeps each INSERT of a team-wide assignment below database parameter limits
+ASSIGN_TASK_BATCH_SIZE = 500
+
+
+def get_template_selection_errors(template: TemplateWorksheet, selected_task_ids):
+    """
+    Check a choice of optional tasks against the groups of `template`.
+
+    Tasks of a group are optional and only the selected ones are copied, while
+    tasks outside any group always are. Returns a list of error messages.
+    """
+    grouped_tasks = {}
+    for task in template.tasks.all():
+        if task.group_id is not None:
+            grouped_tasks[task.id] = task
+
+    errors = []
+    unknown_ids = set(selected_task_ids) - grouped_tasks.keys()
+    if unknown_ids:
+        errors.append(
+            "Not optional tasks of this template: "
+            + ", ".join(sorted(str(task_id) for task_id in unknown_ids))
+        )
+
+    selected_per_group = Counter(
+        grouped_tasks[task_id].group_id
+        for task_id in selected_task_ids
+        if task_id in grouped_tasks
+    )
+    for group in template.task_groups.all():
+        selected = selected_per_group[group.id]
+        if group.min_tasks is not None and selected < group.min_tasks:
+            errors.append(
+                f'Select at least {group.min_tasks} tasks from group "{group.name}".'
+            )
+        if group.max_tasks is not None and selected > group.max_tasks:
+            errors.append(
+                f'Select at most {group.max_tasks} tasks from group "{group.name}".'
+            )
+    return errors
+
+
+def _get_copied_tasks(template: TemplateWorksheet, selected_task_ids):
+    return [
+        template_task
+        for template_task in template.tasks.all()
+        # Tasks without a name are only notes in the template
+        if template_task.task
+        and (template_task.group_id is None or template_task.id in selected_task_ids)
+    ]
+
+
+def _build_worksheet(template: TemplateWorksheet, user, template_tasks) -> Worksheet:
+    # Copied tasks all start as to do, so the counters are known up front
+    return Worksheet(
+        user=user,
+        name=template.name,
+        description=template.description,
+        template=template,
+        task_count=len(template_tasks),
+    )
+
+
+def _build_tasks(worksheet: Worksheet, template_tasks) -> list[Task]:
+    return [
+        Task(
+            worksheet=worksheet,
+            task=template_task.task,
+            description=template_task.description,
+            category=template_task.category,
+            order=template_task.order,
+        )
+        for template_task in template_tasks
+    ]
+
+
+def _validate_selection(template: TemplateWorksheet, selected_task_ids):
+    errors = get_template_selection_errors(template, selected_task_ids)
+    if errors:
+        raise ValidationError({"task_ids": errors})
+
+
+@transaction.atomic
+def instantiate_template(
+    template: TemplateWorksheet, user, selected_task_ids=()
+) -> Worksheet:
+    """
+    Create a worksheet for `user` from `template` with a fixed number of queries.
+
+    Template tasks are copied with a single bulk insert, keeping their category
+    and order. `template` should come with its tasks and task groups prefetched.
+    """
+    selected_task_ids = set(selected_task_ids)
+    _validate_selection(template, selected_task_ids)
+    template_tasks = _get_copied_tasks(template, selected_task_ids)
+
+    worksheet = _build_worksheet(template, user, template_tasks)
+    worksheet.save()
+    tasks = Task.objects.bulk_create(_build_tasks(worksheet, template_tasks))
+    if tasks:
+        tasks_bulk_created.send(sender=Task, tasks=tasks)
+    return worksheet
+
+
+@transaction.atomic
+def assign_template(
+    template: TemplateWorksheet, users, selected_task_ids=()
+) -> tuple[list[Worksheet], list]:
+    """
+    Create a worksheet from `template` for each of `users` in one transaction.
+
+    Users who already have an active (neither archived nor deleted) worksheet
+    from the template are skipped. Worksheets and their tasks are written with
+    one bulk insert each, whatever the number of users. Returns the created
+    worksheets and the skipped users.
+    """
+    selected_task_ids = set(selected_task_ids)
+    _validate_selection(template, selected_task_ids)
+    template_tasks = _get_copied_tasks(template, selected_task_ids)
+
+    assigned_user_ids = set(
+        Worksheet.objects.filter(
+            template=template, user__in=users, deleted=False, is_archived=False
+        ).values_list("user_id", flat=True)
+    )
+    skipped = [user for user in users if user.id in assigned_user_ids]
+    worksheets = Worksheet.objects.bulk_create(
+        _build_worksheet(template, user, template_tasks)
+        for user in users
+        if user.id not in assigned_user_ids
+    )
+    tasks = Task.objects.bulk_create(
+        [
+            task
+            for worksheet in worksheets
+            for task in _build_tasks(worksheet, template_tasks)
+        ],
+        batch_size=ASSIGN_TASK_BATCH_SIZE,
+    )
+    if tasks:
+        tasks_bulk_created.send(sender=Task, tasks=tasks)
+    return worksheets, skipped
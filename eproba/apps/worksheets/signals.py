@@ -0,0 +1,202 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from apps.teams.models import Patrol
+from apps.users.models import User
+
+from .catalogue import get_template_scope, invalidate_template_catalogue
+from .images import delete_image_variants
+from .models import (
+    Task,
+    TemplateTask,
+    TemplateTaskGroup,
+    TemplateWorksheet,
+    Worksheet,
+    touch_worksheets,
+)
+from .search import refresh_search_index
+from .sync import record_visibility_loss
+from .tasks import generate_template_image_variants
+
+# Sent with `tasks` after tasks were inserted with bulk_create, which skips
+# Task.save() and the model's pre_save/post_save signals.
+tasks_bulk_created = Signal()
+
+# Sent with `changes`, a list of (task, {attname: old value}) pairs, after
+# existing tasks were written with bulk_update.
+tasks_bulk_updated = Signal()
+
+# Task fields copied to the search index
+SEARCHED_WORKSHEET_FIELDS = {"name", "description"}
+SEARCHED_TASK_FIELDS = {"task", "description", "worksheet_id"}
+
+
+@receiver(post_save, sender=TemplateWorksheet)
+@receiver(post_delete, sender=TemplateWorksheet)
+def template_changed(sender, instance, using, **kwargs):
+    old_values = instance.tracked_changes()
+    invalidate_template_catalogue(
+        [
+            get_template_scope(instance.team_id, instance.organization),
+            # A template moved between team and organization leaves both
+            get_template_scope(
+                old_values.get("team_id", instance.team_id),
+                old_values.get("organization", instance.organization),
+            ),
+        ],
+        using=using,
+    )
+
+
+@receiver(post_save, sender=TemplateTask)
+@receiver(post_delete, sender=TemplateTask)
+@receiver(post_save, sender=TemplateTaskGroup)
+@receiver(post_delete, sender=TemplateTaskGroup)
+def template_part_changed(sender, instance, using, **kwargs):
+    invalidate_template_catalogue(template_ids=[instance.template_id], using=using)
+
+
+@receiver(post_save, sender=TemplateWorksheet)
+def template_image_changed(sender, instance, using, **kwargs):
+    image_name = instance.image.name or None
+    if instance.image_variants.get("source") == image_name:
+        return
+
+    if image_name:
+        transaction.on_commit(
+            partial(generate_template_image_variants.enqueue, str(instance.pk)),
+            using=using,
+        )
+    else:
+        old_variants = instance.image_variants
+        instance.image_variants = {}
+        TemplateWorksheet.objects.using(using).filter(pk=instance.pk).update(
+            image_variants={}
+        )
+        transaction.on_commit(partial(delete_image_variants, old_variants), using=using)
+
+
+@receiver(post_delete, sender=TemplateWorksheet)
+def template_image_deleted(sender, instance, using, **kwargs):
+    if instance.image_variants:
+        transaction.on_commit(
+            partial(delete_image_variants, instance.image_variants), using=using
+        )
+
+
+@receiver(post_save, sender=Worksheet)
+def worksheet_text_changed(sender, instance, created, using, **kwargs):
+    if created or instance.tracked_changes().keys() & SEARCHED_WORKSHEET_FIELDS:
+        refresh_search_index(worksheet_ids=[instance.id], using=using)
+
+
+@receiver(post_delete, sender=Worksheet)
+def worksheet_deleted(sender, instance, using, **kwargs):
+    refresh_search_index(worksheet_ids=[instance.id], using=using)
+
+
+@receiver(post_save, sender=Task)
+def task_text_changed(sender, instance, created, using, **kwargs):
+    changes = instance.tracked_changes()
+    if created or changes.keys() & SEARCHED_TASK_FIELDS:
+        refresh_search_index(
+            worksheet_ids=[
+                instance.worksheet_id,
+                changes.get("worksheet_id", instance.worksheet_id),
+            ],
+            using=using,
+        )
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, using, **kwargs):
+    refresh_search_index(worksheet_ids=[instance.worksheet_id], using=using)
+
+
+@receiver(tasks_bulk_created, sender=Task)
+def tasks_text_created(sender, tasks, **kwargs):
+    refresh_search_index(worksheet_ids={task.worksheet_id for task in tasks})
+
+
+@receiver(tasks_bulk_updated, sender=Task)
+def tasks_text_updated(sender, changes, **kwargs):
+    refresh_search_index(
+        worksheet_ids={
+            worksheet_id
+            for task, old_values in changes
+            if old_values.keys() & SEARCHED_TASK_FIELDS
+            for worksheet_id in (
+                task.worksheet_id,
+                old_values.get("worksheet_id", task.worksheet_id),
+            )
+        }
+    )
+
+
+@receiver(post_save, sender=TemplateWorksheet)
+@receiver(post_delete, sender=TemplateWorksheet)
+@receiver(post_save, sender=TemplateTask)
+@receiver(post_delete, sender=TemplateTask)
+def template_text_changed(sender, instance, using, **kwargs):
+    template_id = instance.id if sender is TemplateWorksheet else instance.template_id
+    refresh_search_index(template_ids=[template_id], using=using)
+
+
+@receiver(post_save, sender=Worksheet)
+def worksheet_audience_changed(sender, instance, created, using, **kwargs):
+    changes = instance.tracked_changes()
+    if "supervisor_id" in changes:
+        record_visibility_loss([instance.id], supervisor_id=changes["supervisor_id"])
+    if "user_id" in changes:
+        old_team_id = (
+            User.objects.using(using)
+            .filter(pk=changes["user_id"])
+            .values_list("patrol__team_id", flat=True)
+            .first()
+        )
+        record_visibility_loss(
+            [instance.id], owner_id=changes["user_id"], team_id=old_team_id
+        )
+
+
+def _move_worksheets_between_teams(worksheets, old_team_id, new_team_id, using):
+    if old_team_id == new_team_id:
+        return
+    worksheet_ids = list(worksheets.using(using).values_list("id", flat=True))
+    record_visibility_loss(worksheet_ids, team_id=old_team_id)
+    # Leaders of the new team get them in their next delta
+    touch_worksheets(worksheet_ids, using=using)
+
+
+@receiver(post_save, sender=User)
+def owner_changed_team(sender, instance, created, using, **kwargs):
+    changes = instance.tracked_changes()
+    if created or "patrol_id" not in changes:
+        return
+    team_ids = dict(
+        Patrol.objects.using(using)
+        .filter(id__in=[changes["patrol_id"], instance.patrol_id])
+        .values_list("id", "team_id")
+    )
+    _move_worksheets_between_teams(
+        Worksheet.objects.filter(user=instance),
+        team_ids.get(changes["patrol_id"]),
+        team_ids.get(instance.patrol_id),
+        using,
+    )
+
+
+@receiver(post_save, sender=Patrol)
+def patrol_changed_team(sender, instance, created, using, **kwargs):
+    changes = instance.tracked_changes()
+    if created or "team_id" not in changes:
+        return
+    _move_worksheets_between_teams(
+        Worksheet.objects.filter(user__patrol=instance),
+        changes["team_id"],
+        instance.team_id,
+        using,
+    )
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.worksheets.models import Tombstone
+
+SYNC_CURSOR_SALT = "apps.worksheets.sync"
+
+# Changes committed shortly before a cursor was issued may still be invisible
+# to the query that issued it, so every cursor points slightly into the past.
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+
+# Cursors older than this can't be served from tombstones and trigger a full resync.
+TOMBSTONE_RETENTION = timedelta(days=90)
+
+
+def get_sync_scope(user) -> str:
+    """
+    Identify the rule deciding which worksheets `user` can see.
+
+    Leaders see their team's worksheets and others only their own, so a change
+    of team or function changes the whole visible set.
+    """
+    if user.patrol_id is not None and user.function >= 2:
+        return f"team:{user.patrol.team_id}"
+    return "own"
+
+
+def make_sync_cursor(issued_at: datetime, scope: str) -> str:
+    """Return an opaque cursor for changes made after ``issued_at`` within ``scope``."""
+    return signing.dumps(
+        {"t": (issued_at - SYNC_CURSOR_OVERLAP).isoformat(), "s": scope},
+        salt=SYNC_CURSOR_SALT,
+    )
+
+
+def read_sync_cursor(cursor: str) -> tuple[datetime, str | None]:
+    """
+    Decode a cursor issued by make_sync_cursor into its time and scope.
+
+    Raises ValueError when the cursor is invalid.
+    """
+    try:
+        payload = signing.loads(cursor, salt=SYNC_CURSOR_SALT)
+        return datetime.fromisoformat(payload["t"]), payload.get("s")
+    except (signing.BadSignature, KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid sync cursor") from e
+
+
+def is_sync_cursor_expired(changed_after: datetime) -> bool:
+    return changed_after < timezone.now() - TOMBSTONE_RETENTION
+
+
+def get_visible_tombstones(user):
+    """Tombstones of worksheets the user could have seen before they were deleted."""
+    visible = Q(owner_id=user.id) | Q(supervisor_id=user.id)
+    if user.patrol_id is not None:
+        visible |= Q(team_id=user.patrol.team_id)
+    return Tombstone.objects.filter(visible)
+
+
+def record_worksheet_tombstones(worksheets):
+    """Record deletion of worksheets; expects `user__patrol__team_id` to be loadable."""
+    Tombstone.objects.bulk_create(
+        [
+            Tombstone(
+                kind="worksheet",
+                object_id=worksheet["id"],
+                worksheet_id=worksheet["id"],
+                owner_id=worksheet["user_id"],
+                supervisor_id=worksheet["supervisor_id"],
+                team_id=worksheet["user__patrol__team_id"],
+            )
+            for worksheet in worksheets.values(
+                "id", "user_id", "supervisor_id", "user__patrol__team_id"
+            )
+        ]
+    )
+
+
+def record_task_tombstones(worksheet, task_ids):
+    """Record deletion of tasks removed from a worksheet."""
+    team_id = worksheet.user.patrol.team_id if worksheet.user.patrol_id else None
+    Tombstone.objects.bulk_create(
+        [
+            Tombstone(
+                kind="task",
+                object_id=task_id,
+                worksheet_id=worksheet.id,
+                owner_id=worksheet.user_id,
+                supervisor_id=worksheet.supervisor_id,
+                team_id=team_id,
+            )
+            for task_id in task_ids
+        ]
+    )
+
+
+def record_visibility_loss(
+    worksheet_ids, *, owner_id=None, supervisor_id=None, team_id=None
+):
+    """
+    Record that worksheets stopped being visible through an owner, supervisor or team.
+
+    Delta sync reports them as deleted to the users who saw them that way, unless
+    they still see them some other way.
+    """
+    if owner_id is None and supervisor_id is None and team_id is None:
+        return
+    Tombstone.objects.bulk_create(
+        [
+            Tombstone(
+                kind="worksheet",
+                object_id=worksheet_id,
+                worksheet_id=worksheet_id,
+                owner_id=owner_id,
+                supervisor_id=supervisor_id,
+                team_id=team_id,
+            )
+            for worksheet_id in worksheet_ids
+        ]
+    )
+
+
+def purge_expired_tombstones():
+    deleted, _ = Tombstone.objects.filter(
+        deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION
+    ).delete()
+    return deleted
@@ -1,18 +1,102 @@
-from time import time
+from datetime import timedelta
 
+from django.apps import apps
 from django.conf import settings
+from django.db import transaction
+from django.tasks import task
+from django.utils import timezone
 
 logger = settings.LOGGER
 
 
-def remove_expired_deleted_worksheets():
-    from .models import Worksheet
+DELETED_WORKSHEET_RETENTION = timedelta(days=30)
+PURGE_BATCH_SIZE = 500
 
-    count = 0
 
-    for worksheet in Worksheet.objects.filter(deleted=True):
-        if worksheet.updated_at.timestamp() + 2592000 < time():
-            worksheet.delete()
-            count += 1
+def remove_expired_deleted_worksheets(batch_size=PURGE_BATCH_SIZE):
+    """
+    Hard-delete worksheets soft-deleted more than 30 days ago.
 
-    logger.info(f"Removed {count} expired deleted worksheets.")
+    Expired rows are found through the partial index on deleted worksheets and
+    removed together with their tasks in chunks of `batch_size`, each in its own
+    transaction. Returns the number of removed worksheets, tasks and tombstones.
+    """
+    from .models import Task, Worksheet
+    from .sync import purge_expired_tombstones, record_worksheet_tombstones
+
+    expired = Worksheet.objects.filter(
+        deleted=True, updated_at__lt=timezone.now() - DELETED_WORKSHEET_RETENTION
+    )
+    removed = {"worksheets": 0, "tasks": 0}
+    while ids := list(expired.values_list("id", flat=True)[:batch_size]):
+        with transaction.atomic():
+            chunk = Worksheet.objects.filter(id__in=ids)
+            record_worksheet_tombstones(chunk)
+            _, deleted = chunk.delete()
+        removed["worksheets"] += deleted.get(Worksheet._meta.label, 0)
+        removed["tasks"] += deleted.get(Task._meta.label, 0)
+
+    logger.info(
+        f"Removed {removed['worksheets']} expired deleted worksheets "
+        f"with {removed['tasks']} tasks."
+    )
+
+    removed["tombstones"] = purge_expired_tombstones()
+    logger.info(f"Removed {removed['tombstones']} expired sync tombstones.")
+    return removed
+
+
+@task
+def render_pdf_job(model_label, object_id, job_id, base_url, is_template=False):
+    """Render the PDF of a worksheet or template worksheet into the PDF cache."""
+    from .pdf import finish_pdf_job, get_printable_queryset, render_pdf_into_cache
+
+    model = apps.get_model(model_label)
+    obj = get_printable_queryset(model).filter(pk=object_id).first()
+    if obj is None:
+        finish_pdf_job(job_id, error="Worksheet no longer exists")
+        return
+
+    try:
+        render_pdf_into_cache(obj, base_url, is_template=is_template)
+    except Exception as e:
+        logger.exception(f"Failed to render PDF of {model_label} {object_id}")
+        finish_pdf_job(job_id, error=f"Error generating PDF: {e!s}")
+    else:
+        finish_pdf_job(job_id)
+
+
+@task
+def generate_template_image_variants(template_id):
+    """Create the resized variants of a template image, replacing older ones."""
+    from .catalogue import get_template_scope, invalidate_template_catalogue
+    from .images import (
+        delete_image_variants,
+        generate_image_variants,
+        get_variant_files,
+    )
+    from .models import TemplateWorksheet
+
+    template = TemplateWorksheet.objects.filter(pk=template_id).first()
+    if template is None or not template.image:
+        return
+    if template.image_variants.get("source") == template.image.name:
+        return
+
+    try:
+        variants = generate_image_variants(template.image)
+    except Exception:
+        logger.exception(f"Failed to generate image variants of template {template_id}")
+        return
+
+    # Skip the result when the image was replaced in the meantime
+    updated = TemplateWorksheet.objects.filter(
+        pk=template_id, image=template.image.name
+    ).update(image_variants=variants)
+    if updated:
+        delete_image_variants(template.image_variants, keep=get_variant_files(variants))
+        invalidate_template_catalogue(
+            [get_template_scope(template.team_id, template.organization)]
+        )
+    else:
+        delete_image_variants(variants)
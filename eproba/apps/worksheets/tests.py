@@ -0,0 +1,1785 @@
+import json
+import shutil
+import tempfile
+import threading
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from zipfile import ZipFile
+
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tasks_db.models import DBTaskResult
+from PIL import Image
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from apps.teams.api.views import TeamRequestViewSet, TeamStatisticsAPIView
+from apps.teams.models import District, Patrol, Team
+from apps.users.api.permissions import get_permission_context
+from apps.users.models import User
+from apps.webhooks.models import Webhook
+from apps.worksheets.api.permissions import (
+    IsAllowedToAccessTaskNotes,
+    IsAllowedToManageTaskOrReadOnly,
+    IsAllowedToManageWorksheetOrReadOnly,
+    IsTaskOwner,
+)
+from apps.worksheets.api.views import WorksheetViewSet
+from apps.worksheets.models import (
+    SearchDocument,
+    Task,
+    TemplateTask,
+    TemplateTaskGroup,
+    TemplateWorksheet,
+    Tombstone,
+    Worksheet,
+)
+from apps.worksheets.search import fold
+from apps.worksheets.tasks import remove_expired_deleted_worksheets
+
+
+class WorksheetTestMixin:
+    def setUp(self):
+        self.district = District.objects.create(name="Okręg testowy")
+        self.team = Team.objects.create(
+            name="1 Testowa Drużyna",
+            short_name="1 TD",
+            district=self.district,
+            organization=0,
+        )
+        self.patrol = Patrol.objects.create(name="Pierwszy", team=self.team)
+        self.leader = self.create_user("leader@example.com", function=4)
+
+    def create_user(self, email, *, function=0, patrol=None):
+        return User.objects.create(
+            email=email,
+            first_name="Jan",
+            last_name="Testowy",
+            nickname="Test",
+            patrol=patrol or self.patrol,
+            function=function,
+        )
+
+    def create_worksheet(self, user, *, tasks=3, **kwargs):
+        template = TemplateWorksheet.objects.create(
+            name="Szablon", team=self.team, organization=None
+        )
+        worksheet = Worksheet.objects.create(
+            user=user, supervisor=self.leader, template=template, name="Próba", **kwargs
+        )
+        for order in range(tasks):
+            Task.objects.create(
+                worksheet=worksheet,
+                task=f"Zadanie {order}",
+                status=2,
+                approver=self.leader,
+                order=order,
+            )
+        return worksheet
+
+    def create_scout_with_worksheet(self, index, **kwargs):
+        scout = self.create_user(f"scout{index}@example.com")
+        return self.create_worksheet(scout, **kwargs)
+
+
+class WorksheetListQueryCountTests(WorksheetTestMixin, APITestCase):
+    def count_list_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/worksheets/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), len(response.data)
+
+    def assert_constant_query_count(self, params, make_worksheet):
+        make_worksheet(0)
+        small_count, small_size = self.count_list_queries(params)
+        for index in range(1, 6):
+            make_worksheet(index)
+        large_count, large_size = self.count_list_queries(params)
+
+        self.assertGreater(large_size, small_size)
+        self.assertEqual(small_count, large_count)
+
+    def test_default_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.leader)
+        self.assert_constant_query_count({}, self.create_scout_with_worksheet)
+
+    def test_user_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.leader)
+        self.assert_constant_query_count(
+            {"user": ""}, lambda index: self.create_worksheet(self.leader)
+        )
+
+    def test_archived_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.leader)
+        self.assert_constant_query_count(
+            {"archived": ""},
+            lambda index: self.create_scout_with_worksheet(index, is_archived=True),
+        )
+
+    def test_review_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.leader)
+
+        def make_worksheet(index):
+            worksheet = self.create_scout_with_worksheet(index)
+            worksheet.tasks.update(status=1)
+
+        self.assert_constant_query_count({"review": ""}, make_worksheet)
+
+    def test_last_sync_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.leader)
+        self.assert_constant_query_count(
+            {"last_sync": "0"}, self.create_scout_with_worksheet
+        )
+
+
+class WorksheetSyncTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+        self.unchanged = self.create_scout_with_worksheet(0)
+        self.changed = self.create_scout_with_worksheet(1)
+        Worksheet.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def sync(self, since=None):
+        response = self.client.get(
+            "/api/worksheets/sync/", {"since": since} if since else {}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_initial_sync_returns_everything(self):
+        data = self.sync()
+
+        self.assertTrue(data["reset"])
+        self.assertEqual(len(data["worksheets"]), 2)
+        self.assertTrue(data["cursor"])
+
+    def test_delta_sync_returns_changes_and_tombstones(self):
+        cursor = self.sync()["cursor"]
+        removed_task = self.changed.tasks.first()
+
+        response = self.client.patch(
+            f"/api/worksheets/{self.changed.id}/",
+            {
+                "tasks": [
+                    {"id": str(task.id), "task": task.task}
+                    for task in self.changed.tasks.exclude(id=removed_task.id)
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = self.sync(cursor)
+        self.assertFalse(data["reset"])
+        self.assertEqual(
+            [worksheet["id"] for worksheet in data["worksheets"]],
+            [str(self.changed.id)],
+        )
+        self.assertEqual(data["deleted"]["tasks"], [removed_task.id])
+
+    def test_hard_deleted_worksheets_are_reported(self):
+        cursor = self.sync()["cursor"]
+        Worksheet.objects.filter(id=self.unchanged.id).update(
+            deleted=True, updated_at=timezone.now() - timedelta(days=31)
+        )
+
+        remove_expired_deleted_worksheets()
+
+        data = self.sync(cursor)
+        self.assertEqual(data["deleted"]["worksheets"], [self.unchanged.id])
+        self.assertEqual(data["worksheets"], [])
+
+    def test_archived_worksheets_are_sent_as_changed(self):
+        cursor = self.sync()["cursor"]
+        self.changed.is_archived = True
+        self.changed.save()
+
+        data = self.sync(cursor)
+        self.assertEqual(
+            [worksheet["id"] for worksheet in data["worksheets"]],
+            [str(self.changed.id)],
+        )
+        self.assertTrue(data["worksheets"][0]["is_archived"])
+        self.assertEqual(data["deleted"]["worksheets"], [])
+
+    def test_worksheets_of_a_previous_supervisor_are_reported(self):
+        other_team = Team.objects.create(
+            name="2 Testowa Drużyna",
+            short_name="2 TD",
+            district=self.district,
+            organization=0,
+        )
+        supervisor = self.create_user(
+            "supervisor@example.com",
+            function=2,
+            patrol=Patrol.objects.create(name="Drugi", team=other_team),
+        )
+        Worksheet.objects.filter(id=self.changed.id).update(supervisor=supervisor)
+        self.client.force_authenticate(supervisor)
+        cursor = self.sync()["cursor"]
+
+        self.changed.refresh_from_db()
+        self.changed.supervisor = self.leader
+        self.changed.save()
+
+        data = self.sync(cursor)
+        self.assertEqual(data["deleted"]["worksheets"], [self.changed.id])
+        self.assertEqual(data["worksheets"], [])
+
+    def test_worksheets_of_scouts_moved_to_another_team_are_reported(self):
+        Worksheet.objects.update(supervisor=None)
+        cursor = self.sync()["cursor"]
+        other_team = Team.objects.create(
+            name="2 Testowa Drużyna",
+            short_name="2 TD",
+            district=self.district,
+            organization=0,
+        )
+        scout = self.changed.user
+        scout.patrol = Patrol.objects.create(name="Drugi", team=other_team)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            scout.save()
+
+        data = self.sync(cursor)
+        self.assertEqual(data["deleted"]["worksheets"], [self.changed.id])
+        self.assertEqual(data["worksheets"], [])
+
+    def test_change_of_own_team_resets_sync(self):
+        cursor = self.sync()["cursor"]
+        self.leader.function = 0
+        self.leader.save()
+
+        data = self.sync(cursor)
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["worksheets"], [])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/worksheets/sync/", {"since": "garbage"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WorksheetPaginationTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+        for index in range(5):
+            self.create_scout_with_worksheet(index, tasks=1)
+        # Shared timestamps force the id tie-breaker to keep pages stable
+        Worksheet.objects.update(updated_at=timezone.now())
+
+    def test_list_is_not_paginated_by_default(self):
+        response = self.client.get("/api/worksheets/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+
+    def test_pages_cover_every_worksheet_once(self):
+        seen = []
+        url = "/api/worksheets/?paginate=true&page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(worksheet["id"] for worksheet in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(
+            set(seen),
+            {str(pk) for pk in Worksheet.objects.values_list("id", flat=True)},
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/worksheets/", {"cursor": "garbage"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values_is_rejected(self):
+        cursor = urlsafe_b64encode(json.dumps(["not-a-date", "x"]).encode()).decode()
+
+        response = self.client.get("/api/worksheets/", {"cursor": cursor})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WorksheetCreateTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.scout = self.create_user("scout@example.com")
+        self.client.force_authenticate(self.leader)
+
+    def create_with_tasks(self, count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/worksheets/",
+                {
+                    "name": "Próba",
+                    "user_id": str(self.scout.id),
+                    "tasks": [
+                        {"task": f"Zadanie {order}", "order": order}
+                        for order in range(count)
+                    ],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response, len(queries)
+
+    def test_tasks_are_created_with_constant_query_count(self):
+        _, small_count = self.create_with_tasks(2)
+        response, large_count = self.create_with_tasks(20)
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data["tasks"]), 20)
+        self.assertEqual(
+            Task.objects.filter(worksheet_id=response.data["id"]).count(), 20
+        )
+
+    def test_webhooks_are_sent_for_created_tasks(self):
+        Webhook.objects.create(
+            user=self.scout,
+            url="https://example.com/hook",
+            events=["task.status_changed"],
+        )
+
+        with (
+            patch("apps.webhooks.tasks.send_webhook") as send_webhook,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.create_with_tasks(3)
+
+        self.assertEqual(send_webhook.enqueue.call_count, 3)
+
+
+class WorksheetTaskDiffTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+        self.worksheet = self.create_scout_with_worksheet(0, tasks=10)
+        self.tasks = list(self.worksheet.tasks.order_by("order"))
+
+    def patch_tasks(self, tasks_data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f"/api/worksheets/{self.worksheet.id}/",
+                {"tasks": tasks_data},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(
+                ('UPDATE "worksheets_task"', 'INSERT INTO "worksheets_task"')
+            )
+        ]
+
+    def test_only_changed_tasks_are_written(self):
+        Webhook.objects.create(
+            user=self.worksheet.user,
+            url="https://example.com/hook",
+            events=["task.status_changed"],
+        )
+        tasks_data = [{"id": str(task.id), "task": task.task} for task in self.tasks]
+        tasks_data[3]["status"] = 0
+
+        with (
+            patch("apps.webhooks.tasks.send_webhook") as send_webhook,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            writes = self.patch_tasks(tasks_data)
+
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(send_webhook.enqueue.call_count, 1)
+        self.assertEqual(
+            send_webhook.enqueue.call_args.kwargs["payload"]["id"],
+            str(self.tasks[3].id),
+        )
+        self.assertEqual(Task.objects.get(id=self.tasks[3].id).status, 0)
+
+    def test_unchanged_list_writes_no_tasks(self):
+        writes = self.patch_tasks(
+            [{"id": str(task.id), "task": task.task} for task in self.tasks]
+        )
+
+        self.assertEqual(writes, [])
+
+    def test_new_and_removed_tasks_use_one_query_each(self):
+        tasks_data = [{"id": str(task.id)} for task in self.tasks[2:]]
+        tasks_data += [{"task": "Nowe 1"}, {"task": "Nowe 2"}]
+
+        writes = self.patch_tasks(tasks_data)
+
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.worksheet.tasks.count(), 10)
+        self.assertFalse(
+            Task.objects.filter(id__in=[t.id for t in self.tasks[:2]]).exists()
+        )
+
+    def test_new_task_without_name_is_rejected(self):
+        response = self.client.patch(
+            f"/api/worksheets/{self.worksheet.id}/",
+            {"tasks": [{"description": "Bez nazwy"}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.worksheet.tasks.count(), 10)
+
+    def test_template_tasks_are_diffed(self):
+        template = self.worksheet.template
+        kept, changed, removed = (
+            template.tasks.create(task=f"Zadanie {order}", order=order)
+            for order in range(3)
+        )
+
+        response = self.client.patch(
+            f"/api/templates/{template.id}/",
+            {
+                "tasks": [
+                    {"id": str(kept.id), "task": kept.task},
+                    {"id": str(changed.id), "task": "Zmienione"},
+                    {"task": "Nowe"},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(template.tasks.values_list("task", flat=True)),
+            ["Nowe", "Zadanie 0", "Zmienione"],
+        )
+        self.assertFalse(template.tasks.filter(id=removed.id).exists())
+
+
+class WorksheetTouchTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.worksheet = self.create_scout_with_worksheet(0, tasks=5)
+        self.stale = timezone.now() - timedelta(hours=1)
+        Worksheet.objects.update(updated_at=self.stale)
+
+    def test_task_saves_touch_worksheet_once_per_transaction(self):
+        with (
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+            transaction.atomic(),
+        ):
+            for task in self.worksheet.tasks.all():
+                task.status = 0
+                task.save()
+
+        # Status changes also recount the tasks, those UPDATEs leave updated_at alone
+        worksheet_touches = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "worksheets_worksheet"')
+            and '"updated_at"' in query["sql"]
+        ]
+        self.assertEqual(len(worksheet_touches), 1)
+        self.worksheet.refresh_from_db()
+        self.assertGreater(self.worksheet.updated_at, self.stale)
+
+    def test_rolled_back_touch_is_not_written(self):
+        task = self.worksheet.tasks.first()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        task.save()
+                        raise ValueError
+                except ValueError:
+                    pass
+
+        self.assertEqual(callbacks, [])
+        self.worksheet.refresh_from_db()
+        self.assertEqual(self.worksheet.updated_at, self.stale)
+
+    def test_accepting_task_touches_worksheet(self):
+        self.client.force_authenticate(self.leader)
+        task = self.worksheet.tasks.first()
+
+        # Own savepoint, as setUp already registered a touch in the test transaction
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            response = self.client.post(
+                f"/api/worksheets/{self.worksheet.id}/tasks/{task.id}/accept/"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.worksheet.refresh_from_db()
+        self.assertGreater(self.worksheet.updated_at, self.stale)
+
+
+class TaskChangeTrackingTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.worksheet = self.create_scout_with_worksheet(0, tasks=1)
+        self.task = Task.objects.get(worksheet=self.worksheet)
+
+    def test_tracked_changes(self):
+        self.assertEqual(self.task.tracked_changes(), {})
+
+        self.task.status = 1
+        self.task.approver = None
+        self.task.category = "individual"
+
+        self.assertEqual(
+            self.task.tracked_changes(), {"status": 2, "approver_id": self.leader.id}
+        )
+        self.task.save()
+        self.assertEqual(self.task.tracked_changes(), {})
+
+    def test_status_webhook_needs_no_lookup_query(self):
+        Webhook.objects.create(
+            user=self.worksheet.user,
+            url="https://example.com/hook",
+            events=["task.status_changed"],
+        )
+        self.task.status = 3
+
+        with (
+            patch("apps.webhooks.tasks.send_webhook") as send_webhook,
+            self.captureOnCommitCallbacks(execute=True),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            self.task.save()
+
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if query["sql"].startswith('SELECT "worksheets_task"')
+            ]
+        )
+        self.assertEqual(send_webhook.enqueue.call_count, 1)
+
+
+class TaskBatchReviewTests(WorksheetTestMixin, APITestCase):
+    url = "/api/worksheets/review/batch/"
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+        self.worksheets = [self.create_scout_with_worksheet(i) for i in range(2)]
+        Task.objects.update(status=1)
+
+    def review(self, items):
+        with patch("apps.worksheets.api.views.send_notification") as notify:
+            response = self.client.post(self.url, {"tasks": items}, format="json")
+        return response, notify
+
+    def items(self, action):
+        return [
+            {"id": str(task.id), "action": action}
+            for task in Task.objects.filter(worksheet__in=self.worksheets)
+        ]
+
+    def test_tasks_are_reviewed_with_one_notification_per_owner(self):
+        items = self.items("accept")
+        items[0]["action"] = "reject"
+
+        response, notify = self.review(items)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(Task.objects.filter(status=2).count(), 5)
+        self.assertEqual(Task.objects.filter(status=3).count(), 1)
+        self.assertEqual(notify.call_count, 2)
+        self.assertEqual(
+            {call.kwargs["targets"] for call in notify.call_args_list},
+            {worksheet.user for worksheet in self.worksheets},
+        )
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.review(self.items("accept")[:2])
+        Task.objects.update(status=1)
+        self.worksheets += [self.create_scout_with_worksheet(i) for i in range(2, 6)]
+        with CaptureQueriesContext(connection) as large:
+            self.review(self.items("accept"))
+
+        self.assertEqual(len(small), len(large))
+
+    def test_batch_with_foreign_task_changes_nothing(self):
+        other_team = Team.objects.create(
+            name="2 Inna Drużyna",
+            short_name="2 ID",
+            district=self.district,
+            organization=0,
+        )
+        outsider = self.create_user(
+            "outsider@example.com",
+            patrol=Patrol.objects.create(name="Obcy", team=other_team),
+        )
+        foreign = self.create_worksheet(outsider, tasks=1)
+        foreign.supervisor = outsider
+        foreign.save()
+
+        response, notify = self.review(
+            self.items("accept")
+            + [{"id": str(foreign.tasks.get().id), "action": "accept"}]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(
+            Task.objects.filter(worksheet__in=self.worksheets, status=2).exists()
+        )
+        notify.assert_not_called()
+
+    def test_unknown_task_is_rejected(self):
+        response, _ = self.review(
+            [{"id": "00000000-0000-0000-0000-000000000000", "action": "accept"}]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WorksheetPdfCacheTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.worksheet = self.create_scout_with_worksheet(0)
+        self.url = f"/api/worksheets/{self.worksheet.id}/pdf/"
+        patcher = patch("apps.worksheets.pdf.get_renderer")
+        self.renderer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.renderer.write_pdf.return_value = b"%PDF-1.7"
+
+    def test_pdf_is_rendered_once_per_version(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, b"%PDF-1.7")
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(self.renderer.write_pdf.call_count, 1)
+
+        Worksheet.objects.filter(id=self.worksheet.id).update(
+            updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        third = self.client.get(self.url)
+
+        self.assertNotEqual(third["ETag"], first["ETag"])
+        self.assertEqual(self.renderer.write_pdf.call_count, 2)
+
+    def test_conditional_get_returns_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.renderer.write_pdf.call_count, 1)
+
+    def run_worker(self):
+        call_command(
+            "db_worker", batch=True, reload=False, startup_delay=False, verbosity=0
+        )
+
+    def test_async_pdf_job_is_pending_until_rendered(self):
+        response = self.client.get(self.url, {"async": "1"})
+        self.client.get(self.url, {"async": "1"})
+
+        # Rendering waits for the worker, the request only queued it
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertEqual(DBTaskResult.objects.count(), 1)
+        self.renderer.write_pdf.assert_not_called()
+        job_id = DBTaskResult.objects.get().args_kwargs["args"][2]
+        self.assertTrue(response.data["job"].endswith(f"/api/pdf-jobs/{job_id}/"))
+        self.assertEqual(
+            self.client.get(response.data["job"]).status_code,
+            status.HTTP_202_ACCEPTED,
+        )
+
+    def test_async_pdf_job_redirects_when_ready(self):
+        job_url = self.client.get(self.url, {"async": "1"}).data["job"]
+
+        self.run_worker()
+
+        response = self.client.get(job_url)
+        self.assertEqual(response.status_code, status.HTTP_303_SEE_OTHER)
+        self.assertEqual(response.data["status"], "ready")
+        self.assertEqual(response["Location"], f"http://testserver{self.url}")
+        self.assertEqual(self.client.get(self.url).content, b"%PDF-1.7")
+        self.assertEqual(self.renderer.write_pdf.call_count, 1)
+        # A cached PDF makes later jobs ready without queueing anything
+        response = self.client.get(self.url, {"async": "1"})
+        self.assertEqual(response.status_code, status.HTTP_303_SEE_OTHER)
+        self.assertEqual(DBTaskResult.objects.count(), 1)
+
+    def test_unknown_pdf_job_is_not_found(self):
+        response = self.client.get("/api/pdf-jobs/unknown/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(PDF_EXPORT_WORKERS=2)
+class WorksheetPdfExportTests(WorksheetTestMixin, APITestCase):
+    url = "/api/worksheets/export/"
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+        self.worksheets = [self.create_scout_with_worksheet(i) for i in range(5)]
+        patcher = patch("apps.worksheets.pdf.get_renderer")
+        self.renderer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.renderer.write_pdf.return_value = b"%PDF-1.7"
+
+    def export(self, params=None):
+        response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        archive = ZipFile(BytesIO(b"".join(response.streaming_content)))
+        return archive.namelist()
+
+    def test_team_worksheets_are_exported(self):
+        names = self.export({"team": str(self.team.id)})
+
+        self.assertEqual(len(names), 5)
+        self.assertTrue(all(name.endswith(".pdf") for name in names))
+        self.assertEqual(self.renderer.write_pdf.call_count, 5)
+
+    def test_cached_pdfs_are_reused(self):
+        self.client.get(f"/api/worksheets/{self.worksheets[0].id}/pdf/")
+
+        names = self.export({"ids": f"{self.worksheets[0].id},{self.worksheets[1].id}"})
+
+        self.assertEqual(len(names), 2)
+        self.assertEqual(self.renderer.write_pdf.call_count, 2)
+
+    def test_failed_render_is_reported_in_archive(self):
+        self.renderer.write_pdf.side_effect = [b"%PDF-1.7", ValueError("x")]
+
+        names = self.export({"ids": f"{self.worksheets[0].id},{self.worksheets[1].id}"})
+
+        self.assertEqual(sum(name.endswith(" - błąd.txt") for name in names), 1)
+
+    def test_exports_share_one_thread_pool(self):
+        threads = set()
+
+        def write_pdf(html, base_url):
+            threads.add(threading.current_thread())
+            return b"%PDF-1.7"
+
+        self.renderer.write_pdf.side_effect = write_pdf
+        for worksheet in self.worksheets[:3]:
+            self.export({"ids": str(worksheet.id)})
+
+        self.assertEqual(self.renderer.write_pdf.call_count, 3)
+        self.assertLessEqual(len(threads), 2)
+
+    def test_invalid_id_is_rejected(self):
+        response = self.client.get(self.url, {"ids": "garbage"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PurgeDeletedWorksheetsTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.expired = [self.create_scout_with_worksheet(i, tasks=2) for i in range(5)]
+        self.recent = self.create_scout_with_worksheet(5, deleted=True)
+        self.active = self.create_scout_with_worksheet(6)
+        Worksheet.objects.filter(id__in=[w.id for w in self.expired]).update(
+            deleted=True, updated_at=timezone.now() - timedelta(days=31)
+        )
+
+    def test_expired_worksheets_are_removed_in_chunks(self):
+        removed = remove_expired_deleted_worksheets(batch_size=2)
+
+        self.assertEqual(removed, {"worksheets": 5, "tasks": 10, "tombstones": 0})
+        self.assertEqual(
+            set(Worksheet.objects.values_list("id", flat=True)),
+            {self.recent.id, self.active.id},
+        )
+        self.assertEqual(Tombstone.objects.filter(kind="worksheet").count(), 5)
+
+    def test_deleting_a_worksheet_does_not_purge(self):
+        self.client.force_authenticate(self.leader)
+
+        response = self.client.delete(f"/api/worksheets/{self.active.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Worksheet.objects.filter(deleted=True).count(), 7)
+
+
+class TaskUpdateTests(WorksheetTestMixin, APITestCase):
+    def test_task_update_only_touches_task_data(self):
+        worksheet = self.create_scout_with_worksheet(0, tasks=1)
+        task = worksheet.tasks.get()
+        self.client.force_authenticate(self.leader)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f"/api/worksheets/{worksheet.id}/tasks/{task.id}/",
+                {"status": 0},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [query for query in queries if "oauth2_provider" in query["sql"]]
+        )
+
+
+class ReviewInboxTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+
+    def add_pending_worksheet(self, index):
+        worksheet = self.create_scout_with_worksheet(index)
+        worksheet.tasks.filter(order__lt=2).update(status=1)
+        return worksheet
+
+    def get_inbox(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/worksheets/review/inbox/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(queries)
+
+    def test_inbox_groups_pending_tasks_by_worksheet(self):
+        worksheets = [self.add_pending_worksheet(i) for i in range(2)]
+        self.create_scout_with_worksheet(2, deleted=True).tasks.update(status=1)
+
+        data, _ = self.get_inbox()
+
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(
+            {worksheet["id"] for worksheet in data["worksheets"]},
+            {str(worksheet.id) for worksheet in worksheets},
+        )
+        for worksheet in data["worksheets"]:
+            self.assertEqual(worksheet["pending_count"], 2)
+            self.assertEqual(
+                {task["status"] for task in worksheet["pending_tasks"]}, {1}
+            )
+
+    def test_inbox_query_count_is_constant(self):
+        self.add_pending_worksheet(0)
+        _, small = self.get_inbox()
+        for index in range(1, 6):
+            self.add_pending_worksheet(index)
+        data, large = self.get_inbox()
+
+        self.assertEqual(len(data["worksheets"]), 6)
+        self.assertEqual(small, large)
+
+    def test_count(self):
+        self.add_pending_worksheet(0)
+
+        response = self.client.get("/api/worksheets/review/count/")
+
+        self.assertEqual(response.data, {"count": 2})
+
+
+class WorksheetTaskCountTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+        self.worksheet = self.create_scout_with_worksheet(0)
+
+    def assert_counts(self, total, completed, pending=0, rejected=0):
+        self.worksheet.refresh_from_db()
+        self.assertEqual(
+            (
+                self.worksheet.task_count,
+                self.worksheet.completed_task_count,
+                self.worksheet.pending_task_count,
+                self.worksheet.rejected_task_count,
+            ),
+            (total, completed, pending, rejected),
+        )
+
+    def test_task_save_and_delete_update_counts(self):
+        self.assert_counts(3, 3)
+        task = self.worksheet.tasks.first()
+
+        task.status = 1
+        task.save()
+        self.assert_counts(3, 2, pending=1)
+
+        task.delete()
+        self.assert_counts(2, 2)
+
+    def test_stale_worksheet_save_keeps_counts(self):
+        stale = Worksheet.objects.get(id=self.worksheet.id)
+        task = self.worksheet.tasks.first()
+        task.status = 1
+        task.save()
+
+        stale.notes = "Notatka"
+        stale.save()
+
+        self.assert_counts(3, 2, pending=1)
+        self.assertEqual(self.worksheet.notes, "Notatka")
+
+    def test_bulk_task_delete_updates_counts(self):
+        Task.objects.filter(worksheet=self.worksheet, order__lt=2).delete()
+
+        self.assert_counts(1, 1)
+
+    def test_worksheet_api_updates_counts(self):
+        response = self.client.post(
+            "/api/worksheets/",
+            {
+                "name": "Próba",
+                "user_id": str(self.worksheet.user_id),
+                "tasks": [{"task": "Zadanie", "status": 3}, {"task": "Zadanie"}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.data["task_count"], 2)
+        self.assertEqual(response.data["rejected_task_count"], 1)
+
+        tasks = [
+            {"id": str(task.id), "task": task.task, "status": 1}
+            for task in self.worksheet.tasks.all()[:2]
+        ]
+        response = self.client.patch(
+            f"/api/worksheets/{self.worksheet.id}/", {"tasks": tasks}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assert_counts(2, 0, pending=2)
+
+    def test_batch_review_updates_counts(self):
+        self.worksheet.tasks.update(status=1)
+        tasks = list(self.worksheet.tasks.all())
+
+        with patch("apps.worksheets.api.views.send_notification"):
+            self.client.post(
+                "/api/worksheets/review/batch/",
+                {
+                    "tasks": [
+                        {"id": str(tasks[0].id), "action": "accept"},
+                        {"id": str(tasks[1].id), "action": "reject"},
+                    ]
+                },
+                format="json",
+            )
+
+        self.assert_counts(3, 1, pending=1, rejected=1)
+
+    def test_recount_command_repairs_counts(self):
+        Worksheet.objects.update(task_count=0, completed_task_count=7)
+
+        call_command("recount_worksheet_tasks", stdout=StringIO())
+
+        self.assert_counts(3, 3)
+
+
+class GroupedTemplateMixin(WorksheetTestMixin):
+    def setUp(self):
+        super().setUp()
+        self.template = TemplateWorksheet.objects.create(
+            name="Szablon", description="Opis", team=self.team, organization=None
+        )
+        self.group = TemplateTaskGroup.objects.create(
+            template=self.template, name="Do wyboru", min_tasks=1, max_tasks=2
+        )
+        self.required = [self.add_task(f"Zadanie {order}", order) for order in range(2)]
+        self.optional = [
+            self.add_task(f"Opcja {order}", order, group=self.group)
+            for order in range(3)
+        ]
+        self.client.force_authenticate(self.leader)
+
+    def add_task(self, name, order, **kwargs):
+        return TemplateTask.objects.create(
+            template=self.template,
+            task=name,
+            order=order,
+            category="individual" if "group" in kwargs else "general",
+            **kwargs,
+        )
+
+
+class TemplateInstantiateTests(GroupedTemplateMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.scout = self.create_user("scout@example.com")
+
+    def instantiate(self, task_ids):
+        with patch("apps.worksheets.api.views.send_notification") as notify:
+            response = self.client.post(
+                f"/api/templates/{self.template.id}/instantiate/",
+                {
+                    "user_id": str(self.scout.id),
+                    "task_ids": [str(task.id) for task in task_ids],
+                },
+                format="json",
+            )
+        return response, notify
+
+    def test_worksheet_is_created_with_required_and_selected_tasks(self):
+        response, notify = self.instantiate(self.optional[1:])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        worksheet = Worksheet.objects.get(id=response.data["id"])
+        self.assertEqual(worksheet.user, self.scout)
+        self.assertEqual(worksheet.template, self.template)
+        self.assertEqual(worksheet.description, "Opis")
+        self.assertEqual(worksheet.task_count, 4)
+        self.assertEqual(
+            sorted(worksheet.tasks.values_list("task", "category", "order")),
+            [
+                ("Opcja 1", "individual", 1),
+                ("Opcja 2", "individual", 2),
+                ("Zadanie 0", "general", 0),
+                ("Zadanie 1", "general", 1),
+            ],
+        )
+        self.assertEqual(notify.call_count, 1)
+
+    def test_group_limits_are_enforced(self):
+        for task_ids in ([], self.optional, self.required[:1]):
+            response, _ = self.instantiate(task_ids)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("task_ids", response.data)
+        self.assertFalse(Worksheet.objects.filter(user=self.scout).exists())
+
+    def test_query_count_does_not_depend_on_task_count(self):
+        with CaptureQueriesContext(connection) as small:
+            self.instantiate(self.optional[:1])
+        for order in range(2, 20):
+            self.add_task(f"Zadanie {order}", order)
+        with CaptureQueriesContext(connection) as large:
+            response, _ = self.instantiate(self.optional[:1])
+
+        self.assertEqual(len(response.data["tasks"]), 21)
+        self.assertEqual(len(small), len(large))
+
+    def test_scout_cannot_instantiate(self):
+        self.client.force_authenticate(self.scout)
+
+        response, _ = self.instantiate(self.optional[:1])
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TemplateAssignTests(GroupedTemplateMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.scouts = [self.create_user(f"scout{i}@example.com") for i in range(3)]
+        self.other_patrol = Patrol.objects.create(name="Drugi", team=self.team)
+        self.other_scout = self.create_user(
+            "other@example.com", patrol=self.other_patrol
+        )
+
+    def assign(self, **data):
+        data.setdefault("task_ids", [str(self.optional[0].id)])
+        with patch("apps.worksheets.api.views.send_notification") as notify:
+            response = self.client.post(
+                f"/api/templates/{self.template.id}/assign/", data, format="json"
+            )
+        return response, notify
+
+    def test_patrol_members_get_worksheets_in_bulk(self):
+        Worksheet.objects.create(user=self.scouts[0], template=self.template)
+
+        with CaptureQueriesContext(connection) as queries:
+            response, notify = self.assign(patrol_id=str(self.patrol.id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            {item["user_id"] for item in response.data["created"]},
+            {self.leader.id, self.scouts[1].id, self.scouts[2].id},
+        )
+        self.assertEqual(response.data["skipped_user_ids"], [self.scouts[0].id])
+        created = Worksheet.objects.filter(
+            id__in=[item["id"] for item in response.data["created"]]
+        )
+        self.assertEqual(Task.objects.filter(worksheet__in=created).count(), 9)
+        self.assertEqual(set(created.values_list("task_count", flat=True)), {3})
+        # The leader is not notified about a worksheet they created themselves
+        notify.assert_called_once()
+        self.assertEqual(set(notify.call_args.kwargs["targets"]), set(self.scouts[1:]))
+        inserts = [query for query in queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+
+    def test_archived_worksheets_do_not_block_assignment(self):
+        Worksheet.objects.create(
+            user=self.other_scout, template=self.template, is_archived=True
+        )
+
+        response, _ = self.assign(user_ids=[str(self.other_scout.id)])
+
+        self.assertEqual(len(response.data["created"]), 1)
+
+    def test_targets_must_be_in_own_team(self):
+        district = District.objects.create(name="Inny okręg")
+        team = Team.objects.create(
+            name="2 Drużyna", short_name="2 D", district=district
+        )
+        stranger = self.create_user(
+            "stranger@example.com",
+            patrol=Patrol.objects.create(name="Obcy", team=team),
+        )
+
+        for data in (
+            {"team_id": str(team.id)},
+            {"patrol_id": str(stranger.patrol_id)},
+            {"user_ids": [str(stranger.id)]},
+            {"team_id": str(self.team.id), "user_ids": [str(self.leader.id)]},
+        ):
+            response, _ = self.assign(**data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Worksheet.objects.filter(template=self.template).exists())
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_each_member_gets_own_email(self):
+        User.objects.update(email_notifications=True)
+
+        response = self.client.post(
+            f"/api/templates/{self.template.id}/assign/",
+            {"team_id": str(self.team.id), "task_ids": [str(self.optional[0].id)]},
+            format="json",
+        )
+
+        self.assertEqual(len(response.data["created"]), 5)
+        self.assertEqual(
+            sorted(message.to for message in mail.outbox),
+            sorted([user.email] for user in [*self.scouts, self.other_scout]),
+        )
+
+
+class TemplateCatalogueTests(GroupedTemplateMixin, APITestCase):
+    url = "/api/templates/"
+
+    def setUp(self):
+        super().setUp()
+        self.organization_template = TemplateWorksheet.objects.create(
+            name="Szablon organizacji", team=None, organization=self.team.organization
+        )
+
+    def get_catalogue(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers=headers)
+        template_queries = [
+            query for query in queries if "worksheets_template" in query["sql"]
+        ]
+        return response, template_queries
+
+    def test_catalogue_is_served_from_cache(self):
+        response, queries = self.get_catalogue()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(queries)
+
+        cached, queries = self.get_catalogue()
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(cached["ETag"], response["ETag"])
+        self.assertEqual(queries, [])
+
+    def test_unchanged_catalogue_is_not_modified(self):
+        response, _ = self.get_catalogue()
+
+        not_modified, _ = self.get_catalogue(if_none_match=response["ETag"])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_template_changes_invalidate_catalogue(self):
+        changes = [
+            lambda: self.add_task("Nowe zadanie", 10),
+            lambda: self.group.delete(),
+            lambda: self.organization_template.tasks.create(task="Zadanie"),
+            lambda: self.template.delete(),
+        ]
+        response, _ = self.get_catalogue()
+        for change in changes:
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                change()
+
+            changed, _ = self.get_catalogue()
+            self.assertNotEqual(changed["ETag"], response["ETag"])
+            self.assertNotEqual(changed.data, response.data)
+            response = changed
+
+    def test_template_moved_to_organization_leaves_team_catalogue(self):
+        other_team = Team.objects.create(
+            name="2 Drużyna", short_name="2 D", district=self.district, organization=1
+        )
+        self.organization_template.organization = other_team.organization
+        response, _ = self.get_catalogue()
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.organization_template.save()
+
+        changed, _ = self.get_catalogue()
+        self.assertEqual(len(changed.data), len(response.data) - 1)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "shared": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    }
+)
+class TemplateQueryCountTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.leader)
+
+    def create_template(self, index, *, organization=False):
+        template = TemplateWorksheet.objects.create(
+            name=f"Szablon {index}",
+            team=None if organization else self.team,
+            organization=self.team.organization if organization else None,
+        )
+        for group_index in range(2):
+            group = TemplateTaskGroup.objects.create(
+                template=template, name=f"Grupa {group_index}", max_tasks=1
+            )
+            for order in range(3):
+                TemplateTask.objects.create(
+                    template=template, group=group, task="Zadanie", order=order
+                )
+        TemplateTask.objects.create(template=template, task="Zadanie", order=10)
+        return template
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_list_query_count_is_constant(self):
+        self.create_template(0)
+        _, small = self.count_queries("/api/templates/")
+        for index in range(1, 6):
+            self.create_template(index, organization=index % 2 == 0)
+        response, large = self.count_queries("/api/templates/")
+
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(small, large)
+        group = response.data[0]["task_groups"][0]
+        self.assertEqual(len(group["tasks"]), 3)
+
+    def test_detail_query_count_does_not_depend_on_groups(self):
+        template = self.create_template(0)
+        _, small = self.count_queries(f"/api/templates/{template.id}/")
+        for group in template.task_groups.all():
+            TemplateTask.objects.create(template=template, group=group, task="Nowe")
+        TemplateTaskGroup.objects.create(template=template, name="Grupa 3")
+
+        response, large = self.count_queries(f"/api/templates/{template.id}/")
+
+        self.assertEqual(len(response.data["task_groups"]), 3)
+        self.assertEqual(small, large)
+
+
+@override_settings(
+    # Variants are generated as soon as the upload is committed
+    TASKS={"default": {"BACKEND": "django.tasks.backends.immediate.ImmediateBackend"}},
+)
+class TemplateImageVariantTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.template = TemplateWorksheet.objects.create(
+            name="Szablon", team=self.team, organization=None
+        )
+        self.client.force_authenticate(self.leader)
+
+    def upload(self, name, content):
+        self.template.image = SimpleUploadedFile(name, content)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.template.save()
+        self.template.refresh_from_db()
+
+    def make_image(self, image_format, size=(2000, 1000), mode="RGB"):
+        buffer = BytesIO()
+        Image.new(mode, size).save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    def test_resized_variants_are_generated(self):
+        self.upload("obrazek.jpg", self.make_image("JPEG"))
+
+        variants = self.template.image_variants
+        self.assertEqual(variants["source"], self.template.image.name)
+        for variant, size in (("thumbnail", 320), ("medium", 960)):
+            self.assertEqual(
+                (variants[variant]["width"], variants[variant]["height"]),
+                (size, size // 2),
+            )
+            for key, image_format in (("webp", "WEBP"), ("fallback", "JPEG")):
+                with default_storage.open(variants[variant][key]) as file:
+                    self.assertEqual(Image.open(file).format, image_format)
+
+    def test_transparent_images_fall_back_to_png(self):
+        self.upload("obrazek.png", self.make_image("PNG", mode="RGBA"))
+
+        self.assertTrue(
+            self.template.image_variants["thumbnail"]["fallback"].endswith(".png")
+        )
+
+    def test_variant_urls_are_content_hashed(self):
+        self.upload("obrazek.jpg", self.make_image("JPEG"))
+
+        response = self.client.get(f"/api/templates/{self.template.id}/")
+
+        thumbnail = response.data["image_variants"]["thumbnail"]
+        self.assertRegex(
+            thumbnail["webp"],
+            r"^http://testserver/api/media/template_images/variants/"
+            r".+/thumbnail\.[0-9a-f]{16}\.webp$",
+        )
+
+    def test_replaced_and_removed_images_drop_old_variants(self):
+        self.upload("obrazek.jpg", self.make_image("JPEG"))
+        old_variants = self.template.image_variants
+
+        self.upload("obrazek.jpg", self.make_image("JPEG", size=(1000, 1000)))
+        self.assertNotEqual(self.template.image_variants, old_variants)
+        for variant in ("thumbnail", "medium"):
+            self.assertFalse(default_storage.exists(old_variants[variant]["webp"]))
+
+        new_variants = self.template.image_variants
+        self.template.image = None
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.template.save()
+        self.template.refresh_from_db()
+        self.assertEqual(self.template.image_variants, {})
+        self.assertFalse(default_storage.exists(new_variants["medium"]["fallback"]))
+
+    def test_vector_images_have_no_variants(self):
+        self.upload("obrazek.svg", b"<svg xmlns='http://www.w3.org/2000/svg'/>")
+
+        response = self.client.get(f"/api/templates/{self.template.id}/")
+
+        self.assertEqual(response.data["image_variants"], {})
+
+
+class TaskApproversTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.patrol_leader = self.create_user("zastepowy@example.com", function=2)
+        self.assistant = self.create_user("przyboczny@example.com", function=3)
+        self.create_user("druh@example.com")
+        self.scout = self.create_user("scout@example.com")
+        self.worksheet = self.create_worksheet(self.scout, tasks=0)
+        self.client.force_authenticate(self.scout)
+
+    def get_approvers(self, category="general"):
+        task = Task.objects.create(
+            worksheet=self.worksheet, task="Zadanie", category=category
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/api/worksheets/{self.worksheet.id}/tasks/{task.id}/approvers/"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user_queries = [
+            query for query in queries if 'FROM "users_user"' in query["sql"]
+        ]
+        return {approver["id"] for approver in response.data}, user_queries
+
+    def test_general_tasks_can_be_approved_by_patrol_leaders(self):
+        approvers, _ = self.get_approvers()
+
+        self.assertEqual(
+            approvers,
+            {str(self.leader.id), str(self.assistant.id), str(self.patrol_leader.id)},
+        )
+
+    def test_individual_tasks_need_a_higher_function(self):
+        approvers, _ = self.get_approvers(category="individual")
+
+        self.assertEqual(approvers, {str(self.leader.id), str(self.assistant.id)})
+
+    def test_directory_is_served_from_cache(self):
+        _, queries = self.get_approvers()
+        directory_queries = [query for query in queries if "function" in query["sql"]]
+        self.assertEqual(len(directory_queries), 1)
+
+        _, queries = self.get_approvers()
+        self.assertEqual([query for query in queries if "function" in query["sql"]], [])
+
+    def test_function_change_invalidates_directory(self):
+        self.get_approvers()
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.patrol_leader.function = 0
+            self.patrol_leader.save()
+        approvers, _ = self.get_approvers()
+
+        self.assertNotIn(str(self.patrol_leader.id), approvers)
+
+    def test_patrol_change_invalidates_directory(self):
+        self.get_approvers()
+        other_team = Team.objects.create(
+            name="2 Testowa Drużyna", short_name="2 TD", district=self.district
+        )
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.assistant.patrol = Patrol.objects.create(name="Drugi", team=other_team)
+            self.assistant.save()
+        approvers, _ = self.get_approvers()
+
+        self.assertNotIn(str(self.assistant.id), approvers)
+
+    def test_supervisor_from_another_team_is_included(self):
+        other_team = Team.objects.create(
+            name="2 Testowa Drużyna", short_name="2 TD", district=self.district
+        )
+        supervisor = self.create_user(
+            "opiekun@example.com",
+            function=4,
+            patrol=Patrol.objects.create(name="Drugi", team=other_team),
+        )
+        self.worksheet.supervisor = supervisor
+        self.worksheet.save()
+
+        approvers, _ = self.get_approvers(category="individual")
+
+        self.assertEqual(
+            approvers, {str(supervisor.id), str(self.leader.id), str(self.assistant.id)}
+        )
+
+
+class SearchTests(WorksheetTestMixin, APITestCase):
+    url = "/api/search/"
+
+    def setUp(self):
+        super().setUp()
+        self.scout = self.create_user("scout@example.com")
+        self.other_scout = self.create_user("other@example.com")
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.worksheet = Worksheet.objects.create(
+                user=self.scout, name="Próba na stopień ochotnika"
+            )
+            self.swimming = Task.objects.create(
+                worksheet=self.worksheet, task="Przepłynąć 100 m stylem dowolnym"
+            )
+            Task.objects.create(worksheet=self.worksheet, task="Rozpalić ognisko")
+            self.other_worksheet = Worksheet.objects.create(
+                user=self.other_scout,
+                name="Sprawność pływaka",
+                description="Zdobyta na obozie",
+            )
+            self.template = TemplateWorksheet.objects.create(
+                name="Szablon pływaka", team=self.team, organization=None
+            )
+            TemplateTask.objects.create(template=self.template, task="Pływanie")
+
+    def search(self, user, query):
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url, {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_fold_strips_polish_diacritics(self):
+        self.assertEqual(fold("Zażółć GĘŚLĄ jaźń"), "zazolc gesla jazn")
+
+    def test_leader_finds_worksheets_by_task(self):
+        results = self.search(self.leader, "przeplynac")
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["type"], "worksheet")
+        self.assertEqual(results[0]["id"], self.worksheet.id)
+        self.assertEqual(results[0]["user"]["id"], str(self.scout.id))
+        self.assertEqual(
+            results[0]["tasks"],
+            [{"id": self.swimming.id, "task": self.swimming.task}],
+        )
+
+    def test_words_match_as_prefixes_ignoring_diacritics(self):
+        results = self.search(self.leader, "PŁYW")
+
+        self.assertEqual(
+            {(result["type"], result["id"]) for result in results},
+            {
+                ("worksheet", self.other_worksheet.id),
+                ("template", self.template.id),
+            },
+        )
+
+    def test_all_words_must_match(self):
+        self.assertEqual(
+            self.search(self.leader, "pływaka obozie")[0]["type"], "worksheet"
+        )
+        self.assertEqual(self.search(self.leader, "pływaka ognisko"), [])
+
+    def test_name_matches_rank_first(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            described = Worksheet.objects.create(
+                user=self.scout, name="Sprawność", description="Ognisko"
+            )
+
+        results = self.search(self.leader, "ognisko")
+
+        self.assertEqual(
+            [result["id"] for result in results], [self.worksheet.id, described.id]
+        )
+
+    def test_renamed_worksheet_is_reindexed(self):
+        self.worksheet.name = "Próba na stopień młodzika"
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.worksheet.save()
+
+        self.assertEqual(
+            self.search(self.leader, "mlodzika")[0]["id"], self.worksheet.id
+        )
+
+    def test_saves_without_text_changes_are_not_reindexed(self):
+        self.worksheet.is_archived = True
+        with patch("apps.worksheets.signals.refresh_search_index") as refresh:
+            self.worksheet.save()
+
+        refresh.assert_not_called()
+
+    def test_scout_only_finds_own_worksheets(self):
+        self.assertEqual(self.search(self.scout, "pływ"), [])
+        self.assertEqual(len(self.search(self.scout, "ognisko")), 1)
+        self.assertEqual(self.search(self.other_scout, "ognisko"), [])
+
+    def test_deleted_worksheets_are_not_found(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.worksheet.deleted = True
+            self.worksheet.save()
+
+        self.assertEqual(self.search(self.leader, "ognisko"), [])
+
+    def test_index_follows_task_changes(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.swimming.task = "Przebiec 5 km"
+            self.swimming.save()
+
+        self.assertEqual(self.search(self.leader, "przeplynac"), [])
+        self.assertEqual(len(self.search(self.leader, "przebiec")), 1)
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.swimming.delete()
+
+        self.assertEqual(self.search(self.leader, "przebiec"), [])
+
+    def test_index_follows_task_list_updates(self):
+        self.client.force_authenticate(self.leader)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            response = self.client.patch(
+                f"/api/worksheets/{self.worksheet.id}/",
+                {"tasks": [{"id": str(self.swimming.id), "task": "Wędrówka"}]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(self.search(self.leader, "wedrowka")), 1)
+        self.assertEqual(self.search(self.leader, "ognisko"), [])
+
+    def test_query_is_required(self):
+        self.client.force_authenticate(self.leader)
+
+        response = self.client.get(self.url, {"q": "a"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_search_index(self):
+        SearchDocument.objects.all().delete()
+
+        call_command("rebuild_search_index", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(len(self.search(self.leader, "przeplynac")), 1)
+        self.assertEqual(len(self.search(self.leader, "pływanie")), 1)
+        self.assertEqual(len(self.search(self.leader, "pływaka")), 2)
+
+
+class PermissionContextTests(WorksheetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.scout = self.create_user("scout@example.com")
+        self.worksheets = [self.create_worksheet(self.scout) for _ in range(3)]
+
+    def make_request(self, user):
+        request = Request(APIRequestFactory().post("/"))
+        # Fresh from the database, without the patrol cached by create_user()
+        request.user = User.objects.get(pk=user.pk)
+        return request
+
+    def test_context_is_resolved_once(self):
+        request = self.make_request(self.leader)
+
+        with self.assertNumQueries(1):
+            context = get_permission_context(request)
+            self.assertIs(get_permission_context(request), context)
+
+        self.assertEqual(context.team_id, self.team.id)
+        self.assertEqual(context.function, 4)
+        # The patrol and team loaded for the context are reused by views
+        with self.assertNumQueries(0):
+            self.assertEqual(request.user.patrol.team, self.team)
+
+    def test_object_permissions_need_no_queries(self):
+        request = self.make_request(self.leader)
+        get_permission_context(request)
+        tasks = list(
+            Task.objects.select_related("worksheet__user__patrol").filter(
+                worksheet__in=self.worksheets
+            )
+        )
+        permissions = [
+            IsAllowedToManageTaskOrReadOnly(),
+            IsAllowedToAccessTaskNotes(),
+            IsTaskOwner(),
+        ]
+
+        with self.assertNumQueries(0):
+            results = {
+                type(permission).__name__: all(
+                    permission.has_object_permission(request, None, task)
+                    for task in tasks
+                )
+                for permission in permissions
+            }
+
+        self.assertEqual(
+            results,
+            {
+                "IsAllowedToManageTaskOrReadOnly": True,
+                "IsAllowedToAccessTaskNotes": True,
+                "IsTaskOwner": False,
+            },
+        )
+
+    def test_leader_of_another_team_cannot_manage(self):
+        other_team = Team.objects.create(
+            name="2 Testowa Drużyna", short_name="2 TD", district=self.district
+        )
+        other_leader = self.create_user(
+            "other@example.com",
+            function=4,
+            patrol=Patrol.objects.create(name="Drugi", team=other_team),
+        )
+        permission = IsAllowedToManageWorksheetOrReadOnly()
+        worksheet = self.worksheets[0]
+
+        self.assertFalse(
+            permission.has_object_permission(
+                self.make_request(other_leader), None, worksheet
+            )
+        )
+        self.assertTrue(
+            permission.has_object_permission(
+                self.make_request(self.leader), None, worksheet
+            )
+        )
+        # Supervisors manage their worksheets whatever their team
+        worksheet.supervisor = other_leader
+        self.assertTrue(
+            permission.has_object_permission(
+                self.make_request(other_leader), None, worksheet
+            )
+        )
+
+    def test_scout_without_patrol_cannot_manage(self):
+        worksheet = self.worksheets[0]
+        outsider = self.create_user("outsider@example.com", function=2)
+        User.objects.filter(pk=outsider.pk).update(patrol=None)
+
+        self.assertFalse(
+            IsAllowedToManageWorksheetOrReadOnly().has_object_permission(
+                self.make_request(outsider), None, worksheet
+            )
+        )
+
+
+class QueryPlanTests(WorksheetTestMixin, APITestCase):
+    """Hot queries of the views must be answered from the indexes added for them."""
+
+    def setUp(self):
+        super().setUp()
+        for index in range(5):
+            self.create_scout_with_worksheet(index)
+        if connection.vendor == "postgresql":
+            # Tiny test tables are cheaper to scan, make the planner show
+            # whether an index could be used at all.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def make_view(self, view_class, user, params=None, action="list"):
+        request = Request(APIRequestFactory().get("/", params or {}))
+        request.user = user
+        return view_class(request=request, action=action, format_kwarg=None)
+
+    def assert_uses_index(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_leader_worksheet_list(self):
+        view = self.make_view(WorksheetViewSet, self.leader)
+
+        self.assert_uses_index(view.get_queryset(), "worksheet_user_state_idx")
+
+    def test_scout_worksheet_list(self):
+        scout = User.objects.get(email="scout0@example.com")
+        view = self.make_view(WorksheetViewSet, scout)
+
+        self.assert_uses_index(view.get_queryset(), "worksheet_user_state_idx")
+
+    def test_archived_worksheet_list(self):
+        view = self.make_view(WorksheetViewSet, self.leader, {"archived": ""})
+
+        self.assert_uses_index(view.get_queryset(), "worksheet_user_state_idx")
+
+    def test_delta_sync(self):
+        view = self.make_view(WorksheetViewSet, self.leader, action="sync")
+        since = timezone.now() - timedelta(minutes=5)
+
+        self.assert_uses_index(
+            view.get_sync_queryset().filter(updated_at__gt=since),
+            "worksheet_user_state_idx",
+        )
+
+    def test_purge_of_deleted_worksheets(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        self.assert_uses_index(
+            Worksheet.objects.filter(deleted=True, updated_at__lt=cutoff),
+            "worksheet_deleted_updated_idx",
+        )
+
+    def test_reviewer_inbox(self):
+        view = self.make_view(WorksheetViewSet, self.leader, action="review_inbox")
+
+        self.assert_uses_index(
+            view.get_pending_review_tasks(), "task_approver_status_idx"
+        )
+
+    def test_worksheet_progress(self):
+        worksheet = Worksheet.objects.first()
+        self.assert_uses_index(
+            Task.objects.filter(worksheet=worksheet, status=2),
+            "task_worksheet_status_idx",
+        )
+
+    def test_team_statistics_of_approved_tasks(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assert_uses_index(
+            TeamStatisticsAPIView()._get_completed_tasks(self.team, since),
+            "task_status_approval_idx",
+        )
+
+    def test_active_patrol_members(self):
+        self.assert_uses_index(
+            User.objects.filter(patrol=self.patrol, is_active=True, function__gte=3),
+            "user_active_patrol_idx",
+        )
+
+    def test_team_requests_by_status(self):
+        view = self.make_view(TeamRequestViewSet, self.leader, {"status": "submitted"})
+
+        self.assert_uses_index(view.get_queryset(), "teamrequest_status_created_idx")
@@ -1,23 +1,102 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RowChanges:
+    """Rows touched by apply_row_changes, for firing events only where needed."""
+
+    created: list = field(default_factory=list)
+    # (row, {attname: value before the change}) for every updated row
+    updated: list = field(default_factory=list)
+    deleted_ids: set = field(default_factory=set)
+
+
+def apply_row_changes(queryset, rows_data, build_row):
+    """
+    Make the rows of `queryset` match `rows_data`, a list of validated dicts.
+
+    Entries whose `id` matches an existing row are merged into it, and only rows
+    where a value actually differs are written, with a single bulk_update.
+    Remaining entries become new rows via `build_row(data)` and one bulk_create,
+    and existing rows missing from `rows_data` are removed with one delete.
+    """
+    existing = {row.pk: row for row in queryset}
+    changes = RowChanges()
+    changed_fields = set()
+    seen_ids = set()
+
+    for data in rows_data:
+        data = dict(data)
+        row = existing.get(data.get("id"))
+        if row is None:
+            changes.created.append(build_row(data))
+            continue
+
+        data.pop("id")
+        seen_ids.add(row.pk)
+        old_values = {}
+        for attr, value in data.items():
+            # Compare foreign keys by id so unchanged relations are never fetched
+            model_field = row._meta.get_field(attr)
+            if model_field.is_relation:
+                new_value = value.pk if value is not None else None
+            else:
+                new_value = value
+            old_value = getattr(row, model_field.attname)
+            if old_value != new_value:
+                old_values[model_field.attname] = old_value
+                setattr(row, attr, value)
+        if old_values:
+            changes.updated.append((row, old_values))
+            changed_fields.update(old_values)
+
+    model = queryset.model
+    if changes.updated:
+        model.objects.bulk_update(
+            [row for row, _ in changes.updated], sorted(changed_fields)
+        )
+    if changes.created:
+        model.objects.bulk_create(changes.created)
+    changes.deleted_ids = existing.keys() - seen_ids
+    if changes.deleted_ids:
+        queryset.filter(pk__in=changes.deleted_ids).delete()
+
+    return changes
+
+
 def prepare_worksheet(worksheet):
-    _all = 0
-    _done = 0
-    worksheet.show_submit_task_button = False
-    worksheet.show_sent_tasks_button = False
-    worksheet.show_description_column = False
-    for task in worksheet.tasks.all():
-        _all += 1
-        if task.status == 2:
-            _done += 1
-        elif task.status in [0, 3]:
-            worksheet.show_submit_task_button = True
-        elif task.status == 1:
-            worksheet.show_sent_tasks_button = True
-        if task.description != "":
-            worksheet.show_description_column = True
-    if _all != 0:
-        percent = int(round(_done / _all, 2) * 100)
+    to_do = (
+        worksheet.task_count
+        - worksheet.completed_task_count
+        - worksheet.pending_task_count
+    )
+    worksheet.show_submit_task_button = to_do > 0
+    worksheet.show_sent_tasks_button = worksheet.pending_task_count > 0
+    worksheet.show_description_column = any(
+        task.description != "" for task in worksheet.tasks.all()
+    )
+    if worksheet.task_count:
+        percent = int(
+            round(worksheet.completed_task_count / worksheet.task_count, 2) * 100
+        )
         worksheet.percent = f"{percent}%"
     else:
         worksheet.percent = "Nie masz jeszcze dodanych żadnych zadań"
 
     return worksheet
+
+
+def iter_id_batches(queryset, batch_size):
+    """Yield the primary keys of `queryset` in pk order, as lists of `batch_size`."""
+    batch = []
+    for object_id in (
+        queryset.order_by("pk")
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=batch_size)
+    ):
+        batch.append(object_id)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
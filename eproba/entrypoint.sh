@@ -14,4 +14,8 @@ fi
 python manage.py migrate
 python manage.py collectstatic --no-input --clear
 
+# Background tasks (PDF jobs, webhooks, image variants) run in a worker sharing
+# the container's cache and media directories; restart it if it ever exits
+(while true; do python manage.py db_worker --no-reload; sleep 5; done) &
+
 gunicorn eproba.wsgi:application --bind 0.0.0.0:8000
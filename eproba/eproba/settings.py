@@ -1,5 +1,6 @@
 import logging
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -86,11 +87,14 @@ INSTALLED_APPS = [
     "corsheaders",
     "django_cleanup.apps.CleanupConfig",
     "apps.webhooks.apps.WebhooksConfig",
+    "django_tasks_db",
 ]
 
+# Tasks are stored in the database and run by `manage.py db_worker`, which
+# entrypoint.sh starts next to gunicorn, so they never block a request.
 TASKS = {
     "default": {
-        "BACKEND": "django.tasks.backends.immediate.ImmediateBackend",
+        "BACKEND": "django_tasks_db.DatabaseBackend",
     }
 }
 
@@ -122,6 +126,12 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Default page size of lists that opt in to pagination (see KeysetPagination)
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 50))
+
+# Threads rendering PDFs for bulk worksheet exports, shared by all of them
+PDF_EXPORT_WORKERS = int(os.environ.get("PDF_EXPORT_WORKERS", 4))
+
 # Accounts and authentication
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "root"
@@ -153,6 +163,14 @@ OAUTH2_PROVIDER = {
     "OAUTH2_VALIDATOR_CLASS": "apps.users.oauth_validators.CustomOAuth2Validator",
     "ALLOWED_REDIRECT_URI_SCHEMES": ["https", "http"],
     "REFRESH_TOKEN_GRACE_PERIOD_SECONDS": 120,
+    # Expired tokens are purged by the `cleartokens` cron job in batches, pausing
+    # between them so the token tables are never locked for long
+    "CLEAR_EXPIRED_TOKENS_BATCH_SIZE": int(
+        os.environ.get("CLEAR_EXPIRED_TOKENS_BATCH_SIZE", 1000)
+    ),
+    "CLEAR_EXPIRED_TOKENS_BATCH_INTERVAL": float(
+        os.environ.get("CLEAR_EXPIRED_TOKENS_BATCH_INTERVAL", 0.1)
+    ),
 }
 
 # Constance
@@ -232,6 +250,41 @@ elif os.environ.get("DATABASE", "sqlite") == "postgres":
 else:
     raise ValueError("Invalid database type.")
 
+# Cache
+# Rendered PDFs are kept on disk; entries are culled once MAX_ENTRIES is reached
+# and expire after TIMEOUT seconds.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "pdf": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("PDF_CACHE_DIR", BASE_DIR / "cache" / "pdf"),
+        "TIMEOUT": int(os.environ.get("PDF_CACHE_TIMEOUT", 60 * 60 * 24 * 7)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("PDF_CACHE_MAX_ENTRIES", 1000)),
+            "CULL_FREQUENCY": 4,
+        },
+    },
+    # Shared by all workers, so invalidation reaches every one of them
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("SHARED_CACHE_DIR", BASE_DIR / "cache" / "shared"),
+        "TIMEOUT": 60 * 60 * 24,
+    },
+}
+
+# Tests keep every cache in memory, so they never write into cache/ or share
+# entries with a running server
+if sys.argv[1:2] == ["test"]:
+    CACHES = {
+        alias: {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": alias,
+        }
+        for alias in CACHES
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
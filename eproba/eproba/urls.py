@@ -42,6 +42,8 @@ from apps.users.views import (
 )
 from apps.webhooks.api.views import WebhookViewSet
 from apps.worksheets.api.views import (
+    PdfJobView,
+    SearchView,
     TaskViewSet,
     TemplateWorksheetViewSet,
     WorksheetViewSet,
@@ -142,6 +144,8 @@ urlpatterns = [
         ),
     ),
     path("api/contact/", ContactAPIView.as_view(), name="contact"),
+    path("api/pdf-jobs/<str:job_id>/", PdfJobView.as_view(), name="pdf_job"),
+    path("api/search/", SearchView.as_view(), name="search"),
     path(
         "api/team-statistics/",
         TeamStatisticsAPIView.as_view(),